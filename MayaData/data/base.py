@@ -1,25 +1,55 @@
 from MayaData.lib.pyside import QtWidgets, maya_window
+from MayaData.lib import mdata
 import json
 
+import numpy as np
 
-file_filter = 'Json (*.json)'
+
+file_filter = 'Json (*.json);;MayaData (*.mdata)'
 dialog = QtWidgets.QDialog(maya_window())
 
 
+def _to_json(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError('Object of type {} is not JSON serializable'.format(type(value).__name__))
+
+
 class BaseData(dict):
     def __init__(self, *args, **kwargs):
         super(BaseData, self).__init__(*args, **kwargs)
-        
-    def save(self):
-        file_path, selected_filter = QtWidgets.QFileDialog.getSaveFileName(dialog, 'Select File', '', file_filter)
+
+    def save(self, file_path=None):
+        """
+        The file format is picked by the extension, '.mdata' writes the binary container
+        while anything else is written as json.
+
+        :param str file_path: skips the file dialog when given
+        """
         if not file_path:
+            file_path, selected_filter = QtWidgets.QFileDialog.getSaveFileName(dialog, 'Select File', '', file_filter)
+        if not file_path:
+            return
+        if mdata.is_mdata(file_path):
+            mdata.write(file_path, self)
             return
         with open(file_path, 'w') as f:
-            f.write(json.dumps(self, indent=4))
+            f.write(json.dumps(self, indent=4, default=_to_json))
 
-    def load(self):
-        file_path, selected_filter = QtWidgets.QFileDialog.getOpenFileName(dialog, 'Select File', '', file_filter)
+    def load(self, file_path=None, mmap=False):
+        """
+        :param str file_path: skips the file dialog when given
+        :param bool mmap: '.mdata' only, numeric payloads are kept as read-only numpy.memmap views
+            of the file instead of python lists
+        """
         if not file_path:
+            file_path, selected_filter = QtWidgets.QFileDialog.getOpenFileName(dialog, 'Select File', '', file_filter)
+        if not file_path:
+            return
+        if mdata.is_mdata(file_path):
+            self.update(mdata.read(file_path, mmap=mmap))
             return
         with open(file_path, 'r') as f:
             self.update(json.loads(f.read()))
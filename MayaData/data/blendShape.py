@@ -1,10 +1,12 @@
-from MayaData.lib import pivot, decorator
+from MayaData.lib import pivot, decorator, deformer, buffer, transfer
 from MayaData.data import geometry, uv
 from MayaData.data.base import BaseData
 
 from maya.api import OpenMaya
 from maya import cmds
 
+import numpy as np
+
 
 def get_blend_shape(mesh):
     """
@@ -12,26 +14,65 @@ def get_blend_shape(mesh):
 
     :param str mesh:
     :return: Blendshape found on mesh
-    :rtype: str/None
+    :rtype: OpenMaya.MObject/None
+    """
+    return deformer.find(mesh, OpenMaya.MFn.kBlendShape)
+
+
+FULL_WEIGHT_ITEM = 6000  # inputTargetItem index of the target at weight 1.0
+
+
+def _target_item(blend_mfn, index):
+    """
+    :param OpenMaya.MFnDependencyNode blend_mfn:
+    :param int index: logical index of the target
+    :return: inputTarget[0].inputTargetGroup[index].inputTargetItem[6000]
+    :rtype: OpenMaya.MPlug
+    """
+    plug = blend_mfn.findPlug('inputTarget', False).elementByLogicalIndex(0)
+    plug = plug.child(blend_mfn.attribute('inputTargetGroup')).elementByLogicalIndex(index)
+    return plug.child(blend_mfn.attribute('inputTargetItem')).elementByLogicalIndex(FULL_WEIGHT_ITEM)
+
+
+def _stored_deltas(blend_mfn, item):
+    """
+    Reads the offsets the blendShape keeps for the target, None when they have to be evaluated
+    because the target is still driven by a live mesh or was never stored.
+
+    :rtype: tuple(numpy.ndarray, numpy.ndarray)/None
     """
-    dag = OpenMaya.MSelectionList().add(mesh).getDagPath(0)
-    obj = dag.node()
+    if item.child(blend_mfn.attribute('inputGeomTarget')).isDestination:
+        return
+    try:
+        points = OpenMaya.MFnPointArrayData(item.child(blend_mfn.attribute('inputPointsTarget')).asMObject())
+        components = OpenMaya.MFnComponentListData(item.child(blend_mfn.attribute('inputComponentsTarget')).asMObject())
+    except RuntimeError:
+        return
+
+    indices = list()
+    for i in range(components.length()):
+        indices.extend(OpenMaya.MFnSingleIndexedComponent(components.get(i)).getElements())
+    deltas = buffer.from_point_array(points.array())
+    if len(indices) != len(deltas):
+        return
+    return np.array(indices, dtype=np.int32), deltas
 
-    bs = None
-    dag_iter = OpenMaya.MItDependencyGraph(obj,
-                                           OpenMaya.MItDependencyGraph.kDownstream,
-                                           OpenMaya.MItDependencyGraph.kPlugLevel)
-    while not dag_iter.isDone():
-        current_item = dag_iter.currentNode()
-        if current_item.hasFn(OpenMaya.MFn.kBlendShape):
-            bs = current_item
-            break
-        dag_iter.next()
-    return bs
+
+def _sparse(indices, deltas, tolerance):
+    keep = np.linalg.norm(deltas, axis=1) > tolerance
+    return indices[keep], deltas[keep]
 
 
 @decorator.timer()
-def get(name):
+def get(name, tolerance=1.0e-5):
+    """
+    Stores every target as the sparse offsets from the base mesh,
+    read from the blendShape itself when possible, evaluated otherwise.
+
+    :param str name: mesh with a blendShape
+    :param float tolerance: offsets shorter than it are dropped
+    :rtype: BlendShapeData
+    """
     blend_node = get_blend_shape(name)
     if not blend_node:
         return
@@ -41,6 +82,7 @@ def get(name):
     blend_node = OpenMaya.MFnDependencyNode(blend_node)
     plug = blend_node.findPlug('weight', False)
 
+    weights = [plug.elementByPhysicalIndex(i).asFloat() for i in range(plug.numElements())]
     for i in range(plug.numElements()):
         plug.elementByPhysicalIndex(i).setFloat(0)
 
@@ -50,69 +92,156 @@ def get(name):
     data['geometry'] = geometry.get(name)
     data['uv'] = uv.get(name)
 
+    base = data['geometry']['vertices']
     for j in range(plug.numElements()):
-        data['shapes'].append(plug.elementByPhysicalIndex(j).name().split('.')[-1])
-        plug.elementByPhysicalIndex(j).setFloat(1)
-        data['weights'].append(map(list, mesh.getPoints()))
-        plug.elementByPhysicalIndex(j).setFloat(0)
+        weight_plug = plug.elementByPhysicalIndex(j)
+        index = weight_plug.logicalIndex()
+        target_name = weight_plug.name().split('.')[-1]
+
+        stored = _stored_deltas(blend_node, _target_item(blend_node, index))
+        if stored is None:
+            weight_plug.setFloat(1)
+            deltas = buffer.from_point_array(mesh.getPoints()) - base
+            weight_plug.setFloat(0)
+            stored = np.arange(len(deltas), dtype=np.int32), deltas
+
+        indices, deltas = _sparse(stored[0], stored[1], tolerance)
+        data['shapes'].append(target_name)
+        data['targets'].append({'name': target_name, 'index': index, 'indices': indices, 'deltas': deltas})
+
+    for i, weight in enumerate(weights):
+        plug.elementByPhysicalIndex(i).setFloat(weight)
     return data
 
 
-@decorator.timer()
-def load(data=None, name=None, same_topology=True, meshes_overlapped=True, clamp=0):
-    if not data:
-        data = BlendShapeData()
-        data.load()
+def as_deltas(data, tolerance=1.0e-5):
+    """
+    Converts files storing the full points of every target in 'weights' into sparse targets.
 
-    if name:
-        data['geometry']['name'] = name
+    :param dict data:
+    :rtype: dict
+    """
+    if data.get('targets') or not data.get('weights'):
+        return data
+    base = buffer.as_array(data['geometry']['vertices'], np.float64, 3)
+    targets = list()
+    for i, (name, points) in enumerate(zip(data['shapes'], data['weights'])):
+        deltas = np.asarray(points, dtype=np.float64)[:, :3] - base
+        indices, deltas = _sparse(np.arange(len(deltas), dtype=np.int32), deltas, tolerance)
+        targets.append({'name': name, 'index': i, 'indices': indices, 'deltas': deltas})
+    data['targets'] = targets
+    return data
 
-    blend_node = get_blend_shape(data['geometry']['name'])
 
-    if same_topology:
-        if not blend_node:
-            blend_node = cmds.blendShape(data['geometry']['name'], n=data['name'])[0]
-        for i in range(data['numShapes']):
-            temp_dag = OpenMaya.MSelectionList().add(cmds.duplicate(data['geometry']['name'], n=data['shapes'][i])[0])
-            temp_dag = temp_dag.getDagPath(0)
-            temp = OpenMaya.MFnMesh(temp_dag)
+def target_points(data, target):
+    """
+    :param dict data: BlendShapeData
+    :param dict target: one of data['targets']
+    :return: full (N, 3) points of the target
+    :rtype: numpy.ndarray
+    """
+    points = buffer.as_array(data['geometry']['vertices'], np.float64, 3).copy()
+    points[buffer.as_array(target['indices'], np.int64)] += buffer.as_array(target['deltas'], np.float64, 3)
+    return points
 
-            temp.setPoints(map(OpenMaya.MPoint, data['weights'][i]))
 
-            cmds.blendShape(blend_node, edit=True, t=[data['geometry']['name'], i, temp_dag.fullPathName(), 1.0])
-            cmds.delete(temp_dag.fullPathName())
-        return
+def _queue_target(mod, blend_mfn, target):
+    """
+    Queues the target offsets, its weight element and alias on the modifier, no target mesh is needed.
 
-    if meshes_overlapped:
-        pivot.match_transformations(OpenMaya.MMatrix(data['mesh_matrix']), data['geometry']['name'])
-    if not blend_node:
-        blend_node = cmds.blendShape(data['geometry']['name'], n=data['name'])[0]
+    :param OpenMaya.MDGModifier mod:
+    :param OpenMaya.MFnDependencyNode blend_mfn:
+    :param dict target: one of BlendShapeData['targets']
+    """
+    item = _target_item(blend_mfn, target['index'])
+
+    points_obj = OpenMaya.MFnPointArrayData().create(buffer.to_point_array(target['deltas']))
+
+    component_mfn = OpenMaya.MFnSingleIndexedComponent()
+    component = component_mfn.create(OpenMaya.MFn.kMeshVertComponent)
+    component_mfn.addElements(buffer.to_int_array(target['indices']))
+    components_mfn = OpenMaya.MFnComponentListData()
+    components_obj = components_mfn.create()
+    components_mfn.add(component)
 
-    base_shape = geometry.load(data['geometry'])
-    base_mfn = OpenMaya.MFnTransform(base_shape.parent(0))
-    base_uv = base_shape.getUVSetNames()[0]
+    mod.newPlugValue(item.child(blend_mfn.attribute('inputPointsTarget')), points_obj)
+    mod.newPlugValue(item.child(blend_mfn.attribute('inputComponentsTarget')), components_obj)
 
-    if clamp <= 0:
-        clamp = data['numShapes']
+    weight_plug = blend_mfn.findPlug('weight', False).elementByLogicalIndex(target['index'])
+    mod.newPlugValueFloat(weight_plug, 0.0)
+    mod.commandToExecute('aliasAttr "{}" "{}"'.format(target['name'], weight_plug.name()))
 
-    for i in range(clamp):
-        temp_dag = OpenMaya.MSelectionList().add(cmds.duplicate(base_mfn.fullPathName())[0])
-        temp_dag = temp_dag.getDagPath(0)
-        temp = OpenMaya.MFnMesh(temp_dag)
 
-        copy_dag = OpenMaya.MSelectionList().add(cmds.duplicate(data['geometry']['name'], n=data['shapes'][i])[0])
-        copy_dag = copy_dag.getDagPath(0)
-        copy_uv = OpenMaya.MFnMesh(copy_dag).getUVSetNames()[0]
+@decorator.timer()
+def _queue_targets(mod, blend_mfn, targets):
+    for target in targets:
+        _queue_target(mod, blend_mfn, target)
+
+
+@decorator.timer()
+def _apply(mod):
+    mod.doIt()
 
-        temp.setPoints(map(OpenMaya.MPoint, data['weights'][i]))
 
-        cmds.transferAttributes(temp_dag.fullPathName(), copy_dag.fullPathName(),
-                                pos=True, nml=True, spa=3, sus=base_uv, tus=copy_uv, sm=3, clb=1)
-        cmds.blendShape(blend_node, edit=True, t=[data['geometry']['name'], i, copy_dag.fullPathName(), 1.0])
+def _write_targets(blend_node, targets):
+    # Every target goes through a single modifier, the timers report the build and the apply phases
+    mod = OpenMaya.MDGModifier()
+    _queue_targets(mod, OpenMaya.MFnDependencyNode(blend_node), targets)
+    _apply(mod)
 
-        cmds.delete(temp_dag.fullPathName(), copy_dag.fullPathName())
 
-    cmds.delete(base_mfn.fullPathName())
+@decorator.timer()
+def get_correspondence(data, name, method='uv'):
+    """
+    :param BlendShapeData data: the source base mesh and uvs are read from it
+    :param str name: mesh receiving the targets
+    :param str method: 'uv' matches in uv space, 'closest' by closest point, which needs overlapping meshes
+    :rtype: transfer.Correspondence
+    """
+    source = data['geometry']
+    mfn_mesh = OpenMaya.MFnMesh(OpenMaya.MSelectionList().add(name).getDagPath(0))
+    if method == 'closest':
+        return transfer.from_closest_point(source['vertices'], source['faces'], source['indices'],
+                                           buffer.from_point_array(mfn_mesh.getPoints()))
+    uvs, uv_counts, uv_ids = uv.get_arrays(data['uv'])
+    return transfer.from_uv(len(source['vertices']), uvs, uv_counts, uv_ids, source['faces'], source['indices'],
+                            transfer.vertex_uvs(mfn_mesh))
+
+
+@decorator.timer()
+def load(data=None, name=None, same_topology=True, meshes_overlapped=True, clamp=0, method='uv', workers=1):
+    """
+    :param BlendShapeData data:
+    :param str name: mesh receiving the blendShape, defaults to the one stored
+    :param bool same_topology: otherwise the targets are transferred through a correspondence computed once
+    :param bool meshes_overlapped: matches the mesh transformations to the stored ones before transferring
+    :param int clamp: transfers only the first targets
+    :param str method: transfer correspondence, 'uv' or 'closest'
+    :param int workers: threads moving the targets when transferring
+    """
+    if not data:
+        data = BlendShapeData()
+        data.load()
+    data = as_deltas(data)
+
+    if name:
+        data['geometry']['name'] = name
+    name = data['geometry']['name']
+
+    blend_node = get_blend_shape(name)
+    targets = data['targets']
+
+    if not same_topology:
+        if meshes_overlapped:
+            pivot.match_transformations(OpenMaya.MMatrix(data['geometry']['matrix']), name)
+        if clamp > 0:
+            targets = targets[:clamp]
+        targets = get_correspondence(data, name, method).apply(targets, workers=workers)
+
+    if not blend_node:
+        blend_node = cmds.blendShape(name, n=data['name'])[0]
+        blend_node = OpenMaya.MSelectionList().add(blend_node).getDependNode(0)
+    _write_targets(blend_node, targets)
 
 
 class BlendShapeData(BaseData):
@@ -120,7 +249,7 @@ class BlendShapeData(BaseData):
         super(BlendShapeData, self).__init__()
         self['name'] = str()
         self['shapes'] = list()
-        self['weights'] = list()
+        self['targets'] = list()  # {'name', 'index', 'indices', 'deltas'} offsets of the moved vertices only
         self['numShapes'] = int()
 
         self['geometry'] = dict()
@@ -1,52 +1,248 @@
 from MayaData.data.base import BaseData
-from MayaData.lib import decorator
+from MayaData.lib import buffer, decorator
 
 from maya.api import OpenMaya
 from maya import cmds
 import json
 import numpy as np
-import pandas as pd
 
 
 # with open(str(VAR.MAIN_PATH / 'lib' / 'templates' / 'shape.json'), 'r') as f:
 #     shapes = json.loads(f.read())
 
-# TODO: If it's a multi shapes node, transform it into single shape
+
+def _curve_shapes(dag):
+    """
+    :param OpenMaya.MDagPath dag: transform
+    :return: every nurbs curve shape directly under it, intermediate objects skipped
+    :rtype: list(OpenMaya.MObject)
+    """
+    shapes = list()
+    for i in range(dag.childCount()):
+        child = dag.child(i)
+        if child.hasFn(OpenMaya.MFn.kNurbsCurve) and not OpenMaya.MFnDagNode(child).isIntermediateObject:
+            shapes.append(child)
+    return shapes
+
 
 @decorator.timer()
 def get():
-    data = CurveData()
-    iter = OpenMaya.MItSelectionList(OpenMaya.MGlobal.getActiveSelectionList())
+    """
+    Reads every curve shape of the selected transforms, cvs and knots of all the shapes are stacked
+    in flat arrays indexed by offsets.
 
-    while not iter.isDone():
-        points = get_shape(iter.getDagPath())
-        name = OpenMaya.MFnTransform(iter.getDependNode()).partialPathName()
-        color = get_color(iter.getDagPath())
-
-        shape_node = iter.getDagPath().extendToShape()
+    :rtype: CurveData
+    """
+    data = CurveData()
+    selection = OpenMaya.MGlobal.getActiveSelectionList()
+    shape_offsets, cv_offsets, knot_offsets = [0], [0], [0]
+    cvs, knots = list(), list()
+
+    for i in range(selection.length()):
+        dag = selection.getDagPath(i)
+        if dag.node().hasFn(OpenMaya.MFn.kShape):
+            dag.pop()
+        data['names'].append(OpenMaya.MFnTransform(dag).partialPathName())
+
+        for shape in _curve_shapes(dag):
+            mfn_curve = OpenMaya.MFnNurbsCurve(shape)
+            data['shape_names'].append(mfn_curve.name())
+            data['degrees'].append(mfn_curve.degree)
+            data['forms'].append(mfn_curve.form)
+            data['colors'].append(_color(mfn_curve))
+            cvs.append(buffer.from_point_array(mfn_curve.cvPositions(), homogeneous=True))
+            data['rational'].append(bool((cvs[-1][:, 3] != 1.0).any()))
+            knots.append(np.array(mfn_curve.knots(), dtype=np.float64))
+            cv_offsets.append(cv_offsets[-1] + len(cvs[-1]))
+            knot_offsets.append(knot_offsets[-1] + len(knots[-1]))
+        shape_offsets.append(len(data['shape_names']))
+
+    data['shape_offsets'] = np.array(shape_offsets, dtype=np.int32)
+    data['cv_offsets'] = np.array(cv_offsets, dtype=np.int32)
+    data['knot_offsets'] = np.array(knot_offsets, dtype=np.int32)
+    data['cvs'] = np.concatenate(cvs) if cvs else np.empty((0, 4))
+    data['knots'] = np.concatenate(knots) if knots else np.empty(0)
+    return data
 
-        data['degrees'].append(OpenMaya.MFnDagNode(shape_node).findPlug('degree', False).asInt())
-        data['names'].append(name)
-        data['shapes'].append(points)
-        data['colors'].append(color)
-        iter.next()
 
-    return data
+def _legacy_knots(count, degree):
+    # What the old loader generated for every curve, kept so files written before the knots were stored look the same
+    return np.arange(0, count + degree - 1, 1.0)
+
+
+def as_arrays(data):
+    """
+    :param CurveData data: layout with the real knots, or the legacy one holding a list of cvs per transform
+    :rtype: CurveData
+    """
+    if 'shapes' not in data or len(data.get('cvs', ())):
+        return data
+
+    arrays = CurveData()
+    arrays['names'] = list(data['names'])
+    arrays['shape_names'] = ['{}Shape'.format(name.split('|')[-1]) for name in data['names']]
+    arrays['degrees'] = [int(degree or 3) for degree in data['degrees']]
+    arrays['forms'] = [OpenMaya.MFnNurbsCurve.kOpen] * len(data['names'])
+    arrays['rational'] = [False] * len(data['names'])
+    arrays['colors'] = list(data['colors'])
+
+    cvs = [np.asarray(points, dtype=np.float64) for points in data['shapes']]
+    cvs = [points if points.shape[1] == 4 else np.column_stack([points, np.ones(len(points))]) for points in cvs]
+    knots = [_legacy_knots(len(points), degree) for points, degree in zip(cvs, arrays['degrees'])]
+    arrays['shape_offsets'] = np.arange(len(cvs) + 1, dtype=np.int32)
+    arrays['cv_offsets'] = np.cumsum([0] + [len(points) for points in cvs]).astype(np.int32)
+    arrays['knot_offsets'] = np.cumsum([0] + [len(each) for each in knots]).astype(np.int32)
+    arrays['cvs'] = np.concatenate(cvs) if cvs else np.empty((0, 4))
+    arrays['knots'] = np.concatenate(knots) if knots else np.empty(0)
+    return arrays
+
+
+_ATTRIBUTES = dict()
+
+
+def _curve_attribute(name):
+    """
+    Attribute MObjects are resolved once per session and shared by every curve shape.
+
+    :rtype: OpenMaya.MObject
+    """
+    if name not in _ATTRIBUTES:
+        _ATTRIBUTES[name] = OpenMaya.MNodeClass('nurbsCurve').attribute(name)
+    return _ATTRIBUTES[name]
+
+
+def _curve_data(cvs, knots, degree, form, rational=False):
+    """
+    Builds the curve in memory, nothing is added to the scene.
+
+    :param cvs: (N, 4) cvs as cvPositions() returns them, handed back to create() unchanged
+    :param knots: the numCVs + degree - 1 knots
+    :param bool rational: uses the w of the cvs as weights
+    :rtype: OpenMaya.MObject
+    """
+    cvs = np.asarray(cvs, dtype=np.float64)
+    data_obj = OpenMaya.MFnNurbsCurveData().create()
+    OpenMaya.MFnNurbsCurve().create(OpenMaya.MPointArray(cvs), buffer.to_double_array(knots), int(degree), int(form),
+                                    False, bool(rational), data_obj)
+    return data_obj
+
+
+def _find_transform(name):
+    selection = OpenMaya.MSelectionList()
+    try:
+        selection.add(name)
+    except RuntimeError:
+        return None
+    return selection.getDagPath(0)
+
+
+def _create_transform(dag_mod, name, created):
+    """
+    Queues the transform and the missing parents of its path, renameNode only takes the leaf names.
+
+    :param str name: transform, a partial path when the name isn't unique, ie 'grp|ctrl'
+    :param dict created: path to MObject of the transforms already queued in the modifier
+    :rtype: OpenMaya.MObject
+    """
+    segments = name.split('|')
+    parent = OpenMaya.MObject.kNullObj
+    for i, segment in enumerate(segments):
+        # A full path starts with '|'
+        if not segment:
+            continue
+        path = '|'.join(segments[:i + 1])
+        if path in created:
+            parent = created[path]
+            continue
+        dag = _find_transform(path)
+        if dag is not None:
+            parent = dag.node()
+            continue
+        parent = dag_mod.createNode('transform', parent)
+        dag_mod.renameNode(parent, segment)
+        created[path] = parent
+    return parent
+
+
+def _queue_color(mod, shape, color):
+    mod.newPlugValueBool(OpenMaya.MPlug(shape, _curve_attribute('overrideEnabled')), True)
+    rgb = isinstance(color, (list, tuple, np.ndarray))
+    mod.newPlugValueBool(OpenMaya.MPlug(shape, _curve_attribute('overrideRGBColors')), rgb)
+    if rgb:
+        rgb_plug = OpenMaya.MPlug(shape, _curve_attribute('overrideColorRGB'))
+        for i, value in enumerate(color):
+            mod.newPlugValueDouble(rgb_plug.child(i), float(value))
+        return
+    mod.newPlugValueInt(OpenMaya.MPlug(shape, _curve_attribute('overrideColor')), int(color))
 
 
 @decorator.timer()
 def load(data=None):
+    """
+    Creates the missing curves and replaces the shapes of the existing ones in two modifier passes,
+    the selection is left untouched.
+
+    :param CurveData data: legacy files are converted with as_arrays, they only hold the first shape of
+        every transform so only that one is replaced and keeps its name
+    :return: the shapes created
+    :rtype: list(OpenMaya.MObject)
+    """
     if not data:
         data = CurveData()
         data.load()
-    data = pd.DataFrame(data)
-    for row in data.itertuples(index=False):
-        shape, color, name, degree = row.shapes, row.colors, row.names, row.degrees
-        if cmds.objExists(name):
-            curve = replace(shape, name, degree)
-        else:
-            curve = load_shape(shape, name, degree)
-        load_color(color, curve)
+    arrays = as_arrays(data)
+    legacy = arrays is not data
+    data = arrays
+    shape_offsets = data['shape_offsets']
+
+    # Dag pass: transforms and empty shapes are created, the replaced shapes deleted
+    dag_mod = OpenMaya.MDagModifier()
+    shapes, reconnect, created = list(), list(), dict()
+    for i, name in enumerate(data['names']):
+        rows = range(int(shape_offsets[i]), int(shape_offsets[i + 1]))
+        dag = _find_transform(name)
+        transform = _create_transform(dag_mod, name, created) if dag is None else dag.node()
+
+        # New shapes are parented before the old ones go, so the transform is never left empty
+        new_shapes = [dag_mod.createNode('nurbsCurve', transform) for _ in rows]
+        shape_names = [data['shape_names'][row] for row in rows]
+        if dag is not None and new_shapes:
+            old_shapes = _curve_shapes(dag)
+            if legacy and old_shapes:
+                old_shapes = old_shapes[:1]
+                shape_names = [OpenMaya.MFnDagNode(old_shapes[0]).name()]
+            # One visibility driver per transform, every new shape is connected to it once
+            source = None
+            for old_shape in old_shapes:
+                visibility = OpenMaya.MFnDagNode(old_shape).findPlug('visibility', False)
+                if source is None and visibility.isDestination:
+                    source = visibility.source()
+                dag_mod.deleteNode(old_shape)
+            if source is not None:
+                reconnect.extend((source, shape) for shape in new_shapes)
+        for shape, shape_name in zip(new_shapes, shape_names):
+            dag_mod.renameNode(shape, shape_name)
+        shapes.extend(new_shapes)
+    dag_mod.doIt()
+
+    # Dg pass: geometry, colors and the visibility connections of the replaced shapes
+    mod = OpenMaya.MDGModifier()
+    cached = _curve_attribute('cached')
+    cv_offsets, knot_offsets = data['cv_offsets'], data['knot_offsets']
+    # Files written before the flag was stored only hold non rational curves
+    rational = data.get('rational')
+    if rational is None or not len(rational):
+        rational = [False] * len(shapes)
+    for row, shape in enumerate(shapes):
+        cvs = data['cvs'][cv_offsets[row]:cv_offsets[row + 1]]
+        knots = data['knots'][knot_offsets[row]:knot_offsets[row + 1]]
+        mod.newPlugValue(OpenMaya.MPlug(shape, cached),
+                         _curve_data(cvs, knots, data['degrees'][row], data['forms'][row], rational[row]))
+        _queue_color(mod, shape, data['colors'][row])
+    for source, shape in reconnect:
+        mod.connect(source, OpenMaya.MPlug(shape, _curve_attribute('visibility')))
+    mod.doIt()
+    return shapes
 
 
 def object_size(node):
@@ -85,14 +281,22 @@ def get_shape(name=None):
     return [list(pt) for pt in list(curve_mfn.cvPositions())]
 
 
-def load_shape(points, name=None, degree=None):
+def load_shape(points, name=None, degree=None, knots=None, form=None):
+    """
+    :param list points: cvs
+    :param int degree: 3 by default
+    :param knots: the len(points) + degree - 1 knots, the legacy uniform ones by default
+    :param int form: OpenMaya.MFnNurbsCurve.kOpen, kClosed or kPeriodic
+    """
     if not degree:
         degree = 3
-    num_knots = len(points) + degree - 1
-    knots = OpenMaya.MDoubleArray(np.arange(0, num_knots, 1.0))
+    if knots is None:
+        knots = _legacy_knots(len(points), degree)
+    if form is None:
+        form = OpenMaya.MFnNurbsCurve.kOpen
 
     new = OpenMaya.MFnNurbsCurve()
-    new.create(points, knots, degree, OpenMaya.MFnNurbsCurve.kOpen, False, False)
+    new.create(points, buffer.to_double_array(knots), degree, form, False, False)
     new = new.parent(0)
 
     if not name:
@@ -127,7 +331,10 @@ def get_color(name=None):
     else:
         curve = curve.add(name).getDagPath(0).extendToShape()
 
-    curve_mfn = OpenMaya.MFnDagNode(curve)
+    return _color(OpenMaya.MFnDagNode(curve))
+
+
+def _color(curve_mfn):
     if curve_mfn.findPlug('overrideEnabled', False).asBool():
         if curve_mfn.findPlug('overrideRGBColors', False).asBool():
             value = curve_mfn.findPlug('overrideColorRGB', False)
@@ -239,7 +446,14 @@ def replace(points, name=None, degree=None):
 class CurveData(BaseData):
     def __init__(self):
         super(CurveData, self).__init__()
-        self['names'] = list()
-        self['shapes'] = list()
-        self['colors'] = list()
+        self['names'] = list()  # transforms
+        self['shape_offsets'] = list()  # shapes of transform i are rows shape_offsets[i]:shape_offsets[i + 1]
+        self['shape_names'] = list()
         self['degrees'] = list()
+        self['forms'] = list()  # OpenMaya.MFnNurbsCurve.kOpen, kClosed or kPeriodic
+        self['colors'] = list()
+        self['cv_offsets'] = list()
+        self['rational'] = list()  # the w of the cvs are weights
+        self['cvs'] = list()  # (N, 4) x, y, z, w of every shape as read by cvPositions(), stacked
+        self['knot_offsets'] = list()
+        self['knots'] = list()
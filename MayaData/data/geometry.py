@@ -1,42 +1,44 @@
 from MayaData.data.base import BaseData
-from MayaData.lib import decorator
+from MayaData.lib import decorator, buffer
 
 from maya.api import OpenMaya
 
 
 @decorator.timer()
 def get(name):
+    """
+    :param str name: mesh transform or shape
+    :return: vertices as a (N, 3) array, face counts and face vertex indices as int arrays
+    :rtype: GeometryData
+    """
     dag_obj = OpenMaya.MSelectionList().add(name).getDagPath(0)
     mfn_mesh = OpenMaya.MFnMesh(dag_obj)
     data = GeometryData()
     data['name'] = name
     data['matrix'] = list(dag_obj.inclusiveMatrix())
 
-    data['vertices'] = list()
-    points = mfn_mesh.getPoints()
-    for point in points:
-        data['vertices'].append([point.x, point.y, point.z])
+    data['vertices'] = buffer.from_point_array(mfn_mesh.getPoints())
 
-    data['indices'] = list()
-    data['faces'] = list()
-
-    for face_id in range(0, mfn_mesh.numPolygons):
-        poly_connect = mfn_mesh.getPolygonVertices(face_id)
-        data['faces'].append(len(poly_connect))
-
-        data['indices'].extend([i for i in poly_connect])
+    counts, indices = mfn_mesh.getVertices()
+    data['faces'] = buffer.from_int_array(counts)
+    data['indices'] = buffer.from_int_array(indices)
 
     return data
 
 
 @decorator.timer()
-def load(data=None):
+def load(data=None, mmap=False):
+    """
+    :param GeometryData data: nested lists or numpy arrays, memmap views included
+    :param bool mmap: when loading from file, keeps the '.mdata' payloads mapped instead of reading them as lists
+    """
     if not data:
         data = GeometryData()
-        data.load()
-    face_points = [OpenMaya.MPoint(vertex) for vertex in data['vertices']]
+        data.load(mmap=mmap)
     mfn_mesh = OpenMaya.MFnMesh()
-    mfn_mesh.create(face_points, data['faces'], data['indices'])
+    mfn_mesh.create(buffer.to_point_array(data['vertices']),
+                    buffer.to_int_array(data['faces']),
+                    buffer.to_int_array(data['indices']))
 
     matrix = OpenMaya.MMatrix(data['matrix'])
     matrix = OpenMaya.MTransformationMatrix(matrix)
@@ -44,6 +46,7 @@ def load(data=None):
 
     mod = OpenMaya.MDagModifier()
     mod.renameNode(mfn_mesh.parent(0), data['name']).doIt()
+    return mfn_mesh
 
     
 class GeometryData(BaseData):
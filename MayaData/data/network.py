@@ -1,7 +1,13 @@
 from MayaData.data.base import BaseData
 from MayaData.lib import decorator
+from MayaData.lib.handle import HandleMap
+from MayaData.lib import rename as rename_lib
 
+import array
+import collections
 import copy
+import re
+import numpy as np
 from maya.api import OpenMaya
 from maya import cmds
 
@@ -9,123 +15,419 @@ from maya import cmds
 DEFAULT_ATTR = {'name': None, 'type': None, 'node': None, 'custom': False}
 
 
+def _attribute_kind(attr):
+    """
+    :param OpenMaya.MObject attr:
+    :return: how the value is read and written, None for attributes holding no plain value
+    :rtype: str/None
+    """
+    if attr.hasFn(OpenMaya.MFn.kEnumAttribute):
+        return 'enum'
+    if attr.hasFn(OpenMaya.MFn.kCompoundAttribute):
+        mfn_compound = OpenMaya.MFnCompoundAttribute(attr)
+        children = [_attribute_kind(mfn_compound.child(i)) for i in range(mfn_compound.numChildren())]
+        if children and all(kind in ('double', 'int', 'bool') for kind in children):
+            return 'vector'
+        return None
+    if attr.hasFn(OpenMaya.MFn.kNumericAttribute):
+        unit_type = OpenMaya.MFnNumericAttribute(attr).numericType()
+        if unit_type == OpenMaya.MFnNumericData.kBoolean:
+            return 'bool'
+        if unit_type in (OpenMaya.MFnNumericData.kByte, OpenMaya.MFnNumericData.kChar,
+                         OpenMaya.MFnNumericData.kShort, OpenMaya.MFnNumericData.kInt,
+                         OpenMaya.MFnNumericData.kLong):
+            return 'int'
+        return 'double'
+    if attr.hasFn(OpenMaya.MFn.kUnitAttribute):
+        return 'double'
+    if attr.hasFn(OpenMaya.MFn.kMatrixAttribute):
+        return 'matrix'
+    if attr.hasFn(OpenMaya.MFn.kTypedAttribute):
+        data_type = OpenMaya.MFnTypedAttribute(attr).attrType()
+        if data_type == OpenMaya.MFnData.kString:
+            return 'string'
+        if data_type == OpenMaya.MFnData.kMatrix:
+            return 'matrix'
+    return None
+
+
+def _in_plain_compound(mfn_attr):
+    # Children of arrays need an element index and children of vectors are stored with their parent
+    parent = mfn_attr.parent
+    while not parent.isNull():
+        mfn_parent = OpenMaya.MFnAttribute(parent)
+        if mfn_parent.array or _attribute_kind(parent) == 'vector':
+            return False
+        parent = mfn_parent.parent
+    return True
+
+
+_READERS = {'double': lambda plug: plug.asDouble(),
+            'int': lambda plug: plug.asInt(),
+            'enum': lambda plug: plug.asInt(),
+            'bool': lambda plug: plug.asBool(),
+            'string': lambda plug: plug.asString(),
+            'vector': lambda plug: [plug.child(i).asDouble() for i in range(plug.numChildren())],
+            'matrix': lambda plug: list(OpenMaya.MFnMatrixData(plug.asMObject()).matrix())}
+
+
+def _write_value(mod, plug, kind, value):
+    if kind == 'vector':
+        for i, each in enumerate(value):
+            mod.newPlugValueDouble(plug.child(i), each)
+    elif kind in ('int', 'enum'):
+        mod.newPlugValueInt(plug, int(value))
+    elif kind == 'bool':
+        mod.newPlugValueBool(plug, bool(value))
+    elif kind == 'string':
+        mod.newPlugValueString(plug, value)
+    elif kind == 'matrix':
+        mod.newPlugValue(plug, OpenMaya.MFnMatrixData().create(OpenMaya.MMatrix(value)))
+    else:
+        mod.newPlugValueDouble(plug, value)
+
+
 class MayaNodes(dict):
+    """
+    Attribute schema of every node type met, resolved once per type from its MNodeClass: the writable,
+    storable attributes holding a plain value, with the kind used to read and write them.
+    """
     def __init__(self):
         super(MayaNodes, self).__init__()
         self['DEFAULT'] = {'name': None, 'type': None, 'DAG': False}
-        self['multiplyDivide'] = {'operation': float(), 'input1X': float(), 'input1Y': float(), 'input1Z': float(),
-                                  'input2X': float(), 'input2Y': float(), 'input2Z': float()}
-        self['condition'] = {'operation': float(), 'firstTerm': float(), 'secondTerm': float(),
-                             'colorIfTrueR': float(), 'colorIfTrueG': float(), 'colorIfTrueB': float(),
-                             'colorIfFalseR': float(), 'colorIfFalseG': float(), 'colorIfFalseB': float()}
+
+    def schema(self, type_name):
+        """
+        :param str type_name: node type
+        :return: {'DAG': bool, 'attributes': [(name, kind, MObject)], 'kinds': {name: kind}}
+        :rtype: dict
+        """
+        if type_name in self:
+            return self[type_name]
+
+        attributes = list()
+        for attr in OpenMaya.MNodeClass(type_name).getAttributes():
+            mfn_attr = OpenMaya.MFnAttribute(attr)
+            if not mfn_attr.writable or not mfn_attr.storable or mfn_attr.hidden or mfn_attr.array:
+                continue
+            kind = _attribute_kind(attr)
+            if kind is None or not _in_plain_compound(mfn_attr):
+                continue
+            attributes.append((mfn_attr.name, kind, attr))
+
+        inherited = cmds.nodeType(type_name, isTypeName=True, inherited=True) or list()
+        self[type_name] = {'DAG': 'dagNode' in inherited, 'attributes': attributes,
+                           'kinds': {name: kind for name, kind, _ in attributes}}
+        return self[type_name]
+
+    def kind(self, type_name, attribute):
+        """
+        :return: kind of the attribute, 'double' for the ones outside the schema like dynamic attributes
+        :rtype: str
+        """
+        return self.schema(type_name)['kinds'].get(attribute, 'double')
+
+
+# Shared by every capture and load of the session
+_SCHEMAS = MayaNodes()
 
 
 @decorator.timer()
-def get(name, attribute=None):
-    network = Network()
+def get(name, attribute=None, stop_at=None, max_depth=None, compact=False):
+    """
+    :param str name: node the network is read upstream from
+    :param str attribute: only follows the inputs of this attribute of the node
+    :param stop_at: see Network.start
+    :param int max_depth: see Network.start
+    :param bool compact: streams the network into a NetworkGraph instead of a NetworkData
+    :rtype: NetworkData/NetworkGraph
+    """
+    network = Network(GraphWriter() if compact else None)
     obj = OpenMaya.MSelectionList().add(name).getDependNode(0)
-    network.start(obj, attribute)
-    return network.data
+    network.start(obj, attribute, stop_at, max_depth)
+    return network.writer.data()
+
 
+_ELEMENT = re.compile(r'^(.+)\[(\d+)\]$')
 
-def _replace_prefix(name, prefix_list):
-    root, mid, end = prefix_list
-    name = name.split('_')
-    if name[0] == 'root':
-        return '{}_{}'.format(root, '_'.join(name[1:]))
-    if name[0] == 'mid':
-        return '{}_{}'.format(mid, '_'.join(name[1:]))
-    if name[0] == 'end':
-        return '{}_{}'.format(end, '_'.join(name[1:]))
-    return '_'.join(name)
+
+def _find_plug(mfn_node, path):
+    """
+    Resolves 'attr', 'attr[2]' or 'compound[0].child' on the node without going through the node name.
+
+    :param OpenMaya.MFnDependencyNode mfn_node:
+    :param str path: partial plug name, long attribute names
+    :rtype: OpenMaya.MPlug
+    """
+    plug = None
+    for part in path.split('.'):
+        match = _ELEMENT.match(part)
+        name = match.group(1) if match else part
+        if plug is None:
+            plug = mfn_node.findPlug(name, False)
+        else:
+            plug = plug.child(mfn_node.attribute(name))
+        if match:
+            plug = plug.elementByLogicalIndex(int(match.group(2)))
+    return plug
 
 
 @decorator.timer()
-def load(data=None, prefix_list=None):
+def _create_nodes(nodes):
+    """
+    Existing nodes are reused, the missing ones are created and renamed through one DG and one DAG modifier.
+
+    :param dict nodes: node id to node data
+    :return: node id to MObject
+    :rtype: dict
+    """
+    objects = dict()
+    dg_mod = OpenMaya.MDGModifier()
+    dag_mod = OpenMaya.MDagModifier()
+    for key, node in nodes.items():
+        selection = OpenMaya.MSelectionList()
+        try:
+            selection.add(node['name'])
+            objects[key] = selection.getDependNode(0)
+            continue
+        except RuntimeError:
+            pass
+
+        if node['DAG']:
+            objects[key] = dag_mod.createNode(node['type'], OpenMaya.MObject.kNullObj)
+            dag_mod.renameNode(objects[key], node['name'])
+            continue
+        objects[key] = dg_mod.createNode(node['type'])
+        dg_mod.renameNode(objects[key], node['name'])
+    dg_mod.doIt()
+    dag_mod.doIt()
+    return objects
+
+
+class _PlugCache(object):
+    def __init__(self, objects):
+        self._objects = objects
+        self._functions = dict()
+        self._plugs = dict()
+
+    def get(self, node_key, attribute):
+        key = (node_key, attribute)
+        if key not in self._plugs:
+            if node_key not in self._functions:
+                self._functions[node_key] = OpenMaya.MFnDependencyNode(self._objects[node_key])
+            self._plugs[key] = _find_plug(self._functions[node_key], attribute)
+        return self._plugs[key]
+
+
+def _build(nodes, connections):
+    """
+    :param dict nodes: node key to {'name', 'type', 'DAG', 'attributes'}
+    :param connections: ((node key, attribute), (node key, attribute)) of every connection
+    """
+    objects = _create_nodes(nodes)
+    cache = _PlugCache(objects)
+
+    # Values and connections go through a single modifier
+    mod = OpenMaya.MDGModifier()
+    for key, node in nodes.items():
+        for attr, value in node.get('attributes', dict()).items():
+            _write_value(mod, cache.get(key, attr), _SCHEMAS.kind(node['type'], attr), value)
+
+    connected = set()
+    for source_key, dest_key in connections:
+        dest_plug = cache.get(*dest_key)
+        if dest_key in connected or not dest_plug.source().isNull:
+            continue
+        connected.add(dest_key)
+        mod.connect(cache.get(*source_key), dest_plug)
+    mod.doIt()
+
+
+def _data_connections(data, plugs):
+    for source, destination in data['connections'].items():
+        source = plugs[str(source)]
+        for dest in destination:
+            dest = plugs[str(dest)]
+            yield (str(source['node']), source['name']), (str(dest['node']), dest['name'])
+
+
+def _graph_connections(data, strings):
+    plug_nodes, plug_names = data['plug_nodes'], data['plug_names']
+    for source, dest in zip(data['sources'], data['destinations']):
+        yield ((int(plug_nodes[source]), strings[plug_names[source]]),
+               (int(plug_nodes[dest]), strings[plug_names[dest]]))
+
+
+@decorator.timer()
+def load(data=None, prefix_list=None, rename=None):
+    """
+    :param data: NetworkData or NetworkGraph
+    :param list prefix_list: new root, mid and end prefixes, shortcut for rename.Renamer.from_prefixes
+    :param rename: rename.Renamer, dict or callable applied to the node names
+    """
     if not data:
         data = NetworkData()
         data.load()
+    renamer = rename_lib.Renamer.from_prefixes(prefix_list) if prefix_list else rename_lib.as_renamer(rename)
+
+    if 'sources' in data:
+        graph = data
+        # A compact file read through NetworkData().load() holds the graph keys without the NetworkGraph methods
+        if not isinstance(graph, NetworkGraph):
+            graph = NetworkGraph()
+            graph.update((key, data[key]) for key in graph if key in data)
+        nodes = dict(enumerate(graph.nodes()))
+        if renamer:
+            for node in nodes.values():
+                node['name'] = renamer(node['name'])
+        _build(nodes, _graph_connections(graph, graph['strings']))
+        return data
+
+    # Ids are ints when captured and strings once read from json
+    nodes = {str(key): dict(node) for key, node in data['nodes'].items()}
+    plugs = {str(key): plug for key, plug in data['plugs'].items()}
+    if renamer:
+        for node in nodes.values():
+            node['name'] = renamer(node['name'])
+
+    _build(nodes, _data_connections(data, plugs))
+    return data
 
-    for key, node in data['nodes'].items():
-        if prefix_list:
-            data['nodes'][key]['name'] = _replace_prefix(node['name'], prefix_list)
 
-        if cmds.objExists(node['name']):
-            base_node = OpenMaya.MSelectionList().add(node['name']).getDependNode(0)
-        else:
-            if node['DAG']:
-                node_mod = OpenMaya.MDagModifier()
-                base_node = node_mod.createNode(node['type'], OpenMaya.MObject.kNullObj)
-                node_mod.renameNode(base_node, node['name'])
-                node_mod.doIt()
-                continue
+def _plug_family(plug):
+    """
+    :return: the plug, its existing elements and its children, all levels down
+    :rtype: list(OpenMaya.MPlug)
+    """
+    family = [plug]
+    for each in family:
+        if each.isArray:
+            family.extend(each.elementByLogicalIndex(i) for i in each.getExistingArrayAttributeIndices())
+        elif each.isCompound:
+            family.extend(each.child(i) for i in range(each.numChildren()))
+    return family
+
+
+class _DataWriter(object):
+    """
+    Writes the network as NetworkData, nodes and plugs share one id counter.
+    """
+    def __init__(self):
+        self._data = NetworkData()
+        self._id = 0
 
-            node_mod = OpenMaya.MDGModifier()
-            base_node = node_mod.createNode(node['type'])
-            node_mod.renameNode(base_node, node['name'])
-            node_mod.doIt()
+    def _new_id(self):
+        new_id = self._id
+        self._id += 1
+        return new_id
 
-        if 'attributes' in node.keys():
-            base_node = OpenMaya.MFnDependencyNode(base_node)
-            for attr, value in node['attributes'].items():
-                plug = OpenMaya.MSelectionList().add('{}.{}'.format(base_node.name(), attr)).getPlug(0)
-                plug.setDouble(value)
+    def add_node(self, node_data):
+        node_id = self._new_id()
+        self._data['nodes'][node_id] = node_data
+        return node_id
 
-    if prefix_list:
-        for key, plug in data['plugs'].items():
-            data['plugs'][key]['name'] = _replace_prefix(plug['name'], prefix_list)
-    for source, destination in data['connections'].items():
-        source_node = data['plugs'][source]['node']
-        source_node = data['nodes'][str(source_node)]['name']
+    def add_plug(self, plug_data):
+        plug_id = self._new_id()
+        self._data['plugs'][plug_id] = plug_data
+        return plug_id
 
-        source_attr = data['plugs'][source]['name']
-        source_plug = OpenMaya.MSelectionList().add('{}.{}'.format(source_node, source_attr)).getPlug(0)
+    def connect(self, source, destination):
+        self._data['connections'].setdefault(source, list()).append(destination)
 
-        connect_mod = OpenMaya.MDGModifier()
-        for dest in destination:
-            dest_node = data['plugs'][str(dest)]['node']
-            dest_node = data['nodes'][str(dest_node)]['name']
+    def data(self):
+        return self._data
 
-            dest_attr = data['plugs'][str(dest)]['name']
-            dest_plug = OpenMaya.MSelectionList().add('{}.{}'.format(dest_node, dest_attr)).getPlug(0)
 
-            if not dest_plug.source().isNull:
-                continue
-            connect_mod.connect(source_plug, dest_plug)
-        connect_mod.doIt()
-    return data
+class GraphWriter(object):
+    """
+    Streams the network into flat int buffers, every name goes through a string pool.
+    Nothing is nested, a node, plug or connection costs a few ints until data() builds the NetworkGraph.
+    """
+    def __init__(self):
+        self._strings = dict()
+        self.node_names = array.array('i')
+        self.node_types = array.array('i')
+        self.node_dag = array.array('b')
+        self.node_attributes = list()
+        self.plug_nodes = array.array('i')
+        self.plug_names = array.array('i')
+        self.plug_custom = array.array('b')
+        self.sources = array.array('i')
+        self.destinations = array.array('i')
+
+    def string(self, value):
+        index = self._strings.get(value)
+        if index is None:
+            index = self._strings[value] = len(self._strings)
+        return index
+
+    def add_node(self, node_data):
+        self.node_names.append(self.string(node_data['name']))
+        self.node_types.append(self.string(node_data['type']))
+        self.node_dag.append(node_data['DAG'])
+        self.node_attributes.append(node_data.get('attributes', dict()))
+        return len(self.node_names) - 1
+
+    def add_plug(self, plug_data):
+        self.plug_nodes.append(plug_data['node'])
+        self.plug_names.append(self.string(plug_data['name']))
+        self.plug_custom.append(plug_data['custom'])
+        return len(self.plug_nodes) - 1
+
+    def connect(self, source, destination):
+        self.sources.append(source)
+        self.destinations.append(destination)
+
+    def data(self):
+        """
+        :rtype: NetworkGraph
+        """
+        graph = NetworkGraph()
+        graph['strings'] = list(self._strings)
+        for key in ('node_names', 'node_types', 'plug_nodes', 'plug_names', 'sources', 'destinations'):
+            graph[key] = np.asarray(getattr(self, key)).astype(np.int32, copy=False)
+        graph['node_dag'] = np.asarray(self.node_dag).astype(np.int8, copy=False)
+        graph['plug_custom'] = np.asarray(self.plug_custom).astype(np.int8, copy=False)
+        graph['node_attributes'] = self.node_attributes
+        return graph
 
 
 class Network(object):
-    def __init__(self):
-        self.data = NetworkData()
-        self.nodes = MayaNodes()
+    def __init__(self, writer=None):
+        """
+        :param writer: GraphWriter, NetworkData is written by default
+        """
+        self.writer = writer or _DataWriter()
+        self.nodes = _SCHEMAS
         self.plug_cache = dict()
-        self.node_cache = dict()
+        self.node_cache = HandleMap()  # node to node id
         self.stop_at_node = None
-        self.connection_cache = dict()
-        self._id = 1
+        self.stats = {'nodes': 0, 'plugs': 0, 'connections': 0}
+        self._connected = set()
 
-    def get_node_data(self, node):
-        node_data = copy.deepcopy(self.nodes['DEFAULT'])
-        custom_data = None
-        if node.typeName in self.nodes:
-            custom_data = copy.deepcopy(self.nodes[node.typeName])
+    @property
+    def data(self):
+        return self.writer.data()
 
-        node_data['name'] = node.name()
-        node_data['type'] = node.typeName
-
-        if 'dagNode' in cmds.nodeType(node.name(), inherited=True):
-            node_data['DAG'] = True
-
-        if not custom_data:
-            return node_data
-
-        for attr in custom_data.keys():
-            plug = node.findPlug(attr, False)
-            custom_data[attr] = plug.asDouble()
+    def get_node_data(self, node):
+        """
+        :param OpenMaya.MFnDependencyNode node:
+        :return: name, type, DAG flag and the attributes of the schema that aren't connected or at their default
+        :rtype: dict
+        """
+        schema = self.nodes.schema(node.typeName)
+        node_data = {'name': node.name(), 'type': node.typeName, 'DAG': schema['DAG']}
+
+        obj = node.object()
+        attributes = dict()
+        for name, kind, attr in schema['attributes']:
+            plug = OpenMaya.MPlug(obj, attr)
+            if plug.isDestination or plug.isDefaultValue():
+                continue
+            attributes[name] = _READERS[kind](plug)
 
-        node_data.update({'attributes': custom_data})
+        if attributes:
+            node_data['attributes'] = attributes
         return node_data
 
     def get_plug_data(self, plug):
@@ -136,73 +438,95 @@ class Network(object):
         if OpenMaya.MFnAttribute(plug.attribute()).dynamic:
             plug_data['custom'] = True
 
-        temp_node = OpenMaya.MFnDependencyNode(plug.node()).name()
-        plug_data['node'] = self.node_cache[temp_node]
+        plug_data['node'] = self.node_cache.get(OpenMaya.MObjectHandle(plug.node()))
 
         return plug_data
 
-    def start(self, node, attribute=None):
-        # TODO: Connections need to stop at FaceOutput
-        self.node_cache[OpenMaya.MFnDependencyNode(node).name()] = 0
-        self.data['nodes'].update({0: self.get_node_data(OpenMaya.MFnDependencyNode(node))})
-        # initial_node_name = self.data['nodes'][0]['name']
+    def _add_node(self, obj):
+        handle = OpenMaya.MObjectHandle(obj)
+        node_id = self.node_cache.get(handle)
+        if node_id is None:
+            node_id = self.node_cache.setdefault(handle, self.writer.add_node(
+                self.get_node_data(OpenMaya.MFnDependencyNode(obj))))
+        return node_id
+
+    def _add_plug(self, plug):
+        name = plug.name()
+        if name not in self.plug_cache:
+            self.plug_cache[name] = self.writer.add_plug(self.get_plug_data(plug))
+        return self.plug_cache[name]
+
+    def _is_stop(self, mfn_node):
+        return bool(self.stop_at_node) and (mfn_node.typeName in self.stop_at_node or
+                                            mfn_node.name() in self.stop_at_node)
+
+    def start(self, node, attribute=None, stop_at=None, max_depth=None):
+        """
+        Walks the graph upstream once, breadth first. Every node is expanded a single time and every
+        connection is recorded a single time, outgoing connections of the visited nodes included.
+
+        :param OpenMaya.MObject node: start node
+        :param str attribute: only follows the inputs of this attribute of the start node
+        :param stop_at: node types or names recorded but whose connections aren't followed, ie the mesh or
+            groupParts a deformer network ends on
+        :param int max_depth: upstream levels followed from the start node, unlimited by default
+        """
+        self.stop_at_node = set(stop_at) if stop_at else None
+        self._add_node(node)
+
+        root_plugs = None
         if attribute:
-            node = OpenMaya.MFnDependencyNode(node).findPlug(attribute, False)
-        left_iter = OpenMaya.MItDependencyGraph(node,
-                                                OpenMaya.MItDependencyGraph.kUpstream,
-                                                OpenMaya.MItDependencyGraph.kBreadthFirst,
-                                                OpenMaya.MItDependencyGraph.kPlugLevel)
-
-        while not left_iter.isDone():
-            node_on_left = OpenMaya.MFnDependencyNode(left_iter.currentNode())
-            map(self.traverse_connections, node_on_left.getConnections())
-            right_iter = OpenMaya.MItDependencyGraph(left_iter.currentNode(),
-                                                     OpenMaya.MItDependencyGraph.kUpstream,
-                                                     OpenMaya.MItDependencyGraph.kDepthFirst,
-                                                     OpenMaya.MItDependencyGraph.kPlugLevel)
-            while not right_iter.isDone():
-                node_on_right = OpenMaya.MFnDependencyNode(right_iter.currentNode())
-                map(self.traverse_connections, node_on_right.getConnections())
-                right_iter.next()
-            left_iter.next()
-        self.data['connections'].update(self.connection_cache)
-
-    def traverse_connections(self, source_plug):
-        source_node = OpenMaya.MFnDependencyNode(source_plug.node())
-        for destination_plug in source_plug.destinations():
-            destination_node = OpenMaya.MFnDependencyNode(destination_plug.node())
-
-            if destination_node.isDefaultNode or destination_plug.attribute().hasFn(OpenMaya.MFn.kMessageAttribute):
+            root_plugs = _plug_family(OpenMaya.MFnDependencyNode(node).findPlug(attribute, False))
+
+        visited = HandleMap()
+        visited.setdefault(OpenMaya.MObjectHandle(node), True)
+        queue = collections.deque([(node, 0)])
+        while queue:
+            obj, depth = queue.popleft()
+            mfn_node = OpenMaya.MFnDependencyNode(obj)
+            self.stats['nodes'] += 1
+
+            # Stop nodes are boundaries, they're only recorded through the connection that reached them
+            if depth > 0 and self._is_stop(mfn_node):
                 continue
 
-            # print(source_plug)
-            # print(destination_plug)
-            if source_node.name() not in self.node_cache.keys():
-                self.node_cache[source_node.name()] = self._id
-                self.data['nodes'].update({self._id: self.get_node_data(source_node)})
-                self._id += 1
-            if destination_node.name() not in self.node_cache.keys():
-                self.node_cache[destination_node.name()] = self._id
-                self.data['nodes'].update({self._id: self.get_node_data(destination_node)})
-                self._id += 1
-
-            if source_plug.name() not in self.plug_cache.keys():
-                self.plug_cache[source_plug.name()] = self._id
-                self.data['plugs'].update({self._id: self.get_plug_data(source_plug)})
-                self._id += 1
-            if destination_plug.name() not in self.plug_cache.keys():
-                self.plug_cache[destination_plug.name()] = self._id
-                self.data['plugs'].update({self._id: self.get_plug_data(destination_plug)})
-                self._id += 1
-
-            plug_id = self.plug_cache[source_plug.name()]
-            each_id = self.plug_cache[destination_plug.name()]
-
-            if plug_id not in self.connection_cache.keys():
-                self.connection_cache[plug_id] = list()
+            plugs = root_plugs if root_plugs is not None and depth == 0 else mfn_node.getConnections()
+            expand = max_depth is None or depth < max_depth
+            traverse = not (root_plugs is not None and depth == 0)
+            for plug in plugs:
+                self.stats['plugs'] += 1
+                if traverse:
+                    self.traverse_connections(plug)
+                if not plug.isDestination:
+                    continue
+
+                source_plug = plug.source()
+                self._record(source_plug, plug)
+                source = OpenMaya.MObjectHandle(source_plug.node())
+                if not expand or source in visited:
+                    continue
+                visited.setdefault(source, True)
+                queue.append((source.object(), depth + 1))
+
+    def _record(self, source_plug, destination_plug):
+        destination_node = OpenMaya.MFnDependencyNode(destination_plug.node())
+        if destination_node.isDefaultNode or destination_plug.attribute().hasFn(OpenMaya.MFn.kMessageAttribute):
+            return
+
+        self._add_node(source_plug.node())
+        self._add_node(destination_plug.node())
+        plug_id = self._add_plug(source_plug)
+        each_id = self._add_plug(destination_plug)
+
+        if (plug_id, each_id) in self._connected:
+            return
+        self._connected.add((plug_id, each_id))
+        self.writer.connect(plug_id, each_id)
+        self.stats['connections'] += 1
 
-            if each_id not in self.connection_cache[plug_id]:
-                self.connection_cache[plug_id].append(each_id)
+    def traverse_connections(self, source_plug):
+        for destination_plug in source_plug.destinations():
+            self._record(source_plug, destination_plug)
 
 
 class NetworkData(BaseData):
@@ -212,3 +536,54 @@ class NetworkData(BaseData):
         self['plugs'] = dict()
         # {1792: {'parent': 'plugA', 'source': 'plugA[0].another.output', 'destination': 'plugA[0].another.input'}}
         self['connections'] = dict()  # {1792: [8359, 3147]}
+
+
+class NetworkGraph(BaseData):
+    """
+    Compact network: node and plug tables of string pool indices and connections as two parallel
+    arrays of plug indices. Every id is a row, so resolving one on load is an index.
+    """
+    def __init__(self):
+        super(NetworkGraph, self).__init__()
+        self['strings'] = list()
+        self['node_names'] = list()  # string index of every node name
+        self['node_types'] = list()  # string index of every node type
+        self['node_dag'] = list()
+        self['node_attributes'] = list()  # {attribute: value} of every node
+        self['plug_nodes'] = list()  # node index of every plug
+        self['plug_names'] = list()  # string index of every plug name
+        self['plug_custom'] = list()
+        self['sources'] = list()  # plug index
+        self['destinations'] = list()  # plug index
+
+    def nodes(self):
+        """
+        :return: node dicts, as stored in NetworkData
+        :rtype: list(dict)
+        """
+        strings = self['strings']
+        nodes = list()
+        for name, node_type, dag, attributes in zip(self['node_names'], self['node_types'], self['node_dag'],
+                                                    self['node_attributes']):
+            node = {'name': strings[name], 'type': strings[node_type], 'DAG': bool(dag)}
+            if attributes:
+                node['attributes'] = attributes
+            nodes.append(node)
+        return nodes
+
+    @classmethod
+    def from_data(cls, data):
+        """
+        :param NetworkData data: dict layout, captured or read from a file
+        :rtype: NetworkGraph
+        """
+        writer = GraphWriter()
+        node_index = {str(key): writer.add_node(node) for key, node in data['nodes'].items()}
+        plug_index = dict()
+        for key, plug in data['plugs'].items():
+            plug_index[str(key)] = writer.add_plug({'node': node_index[str(plug['node'])], 'name': plug['name'],
+                                                    'custom': plug.get('custom', False)})
+        for source, destination in data['connections'].items():
+            for dest in destination:
+                writer.connect(plug_index[str(source)], plug_index[str(dest)])
+        return writer.data()
@@ -2,39 +2,116 @@ from maya.api import OpenMaya
 from maya import cmds
 
 from MayaData.data.base import BaseData
-from MayaData.lib import decorator
+from MayaData.lib import decorator, buffer
+
+import numpy as np
+
+
+_UNSET_NORMAL = 1.0e19  # the mesh stores 1e20 for face vertices without a user normal
+
+
+def _plug_values(mfn_mesh, attribute, count, width):
+    """
+    Reads the first count elements of a mesh multi attribute in one getAttr. The plugs only hold the
+    mesh itself without construction history.
+
+    :return: (count, width) values, None when the plug doesn't hold them
+    :rtype: numpy.ndarray/None
+    """
+    if mfn_mesh.findPlug('inMesh', False).isDestination:
+        return None
+    if not count or not mfn_mesh.findPlug(attribute, False).numElements():
+        return np.zeros((0, width))
+    try:
+        values = cmds.getAttr('{}.{}[0:{}]'.format(mfn_mesh.fullPathName(), attribute, count - 1))
+    except (RuntimeError, ValueError):
+        return None
+    values = np.array(values, dtype=np.float64).reshape(-1, width)
+    return values if len(values) == count else None
+
+
+def _locked(mfn_mesh, ids, count):
+    """
+    :return: locked state of every normal, from the user normals stored per face vertex
+    :rtype: numpy.ndarray
+    """
+    values = _plug_values(mfn_mesh, 'n', len(ids), 3)
+    if values is None:
+        return np.fromiter((mfn_mesh.isNormalLocked(i) for i in range(count)), dtype=bool, count=count)
+    locked = np.zeros(count, dtype=bool)
+    if len(values):
+        locked[np.asarray(ids)[(np.abs(values) < _UNSET_NORMAL).all(axis=1)]] = True
+    return locked
+
+
+def _smooth(mfn_mesh):
+    """
+    :return: smoothing of every edge, the third value of the mesh edge plug
+    :rtype: numpy.ndarray
+    """
+    count = mfn_mesh.numEdges
+    values = _plug_values(mfn_mesh, 'ed', count, 3)
+    if values is None or len(values) != count:
+        return np.fromiter((mfn_mesh.isEdgeSmooth(i) for i in range(count)), dtype=bool, count=count)
+    return values[:, 2] != 0
 
 
 @decorator.timer()
 def get(name):
+    """
+    :param str name: mesh
+    :return: the normals, their face vertex assignment, locked state and the edge smoothing
+    :rtype: NormalData
+    """
     data = NormalData()
     data['geometry'] = name
 
     mesh = OpenMaya.MSelectionList().add(name).getDagPath(0)
+    mfn_mesh = OpenMaya.MFnMesh(mesh)
 
-    vertex_iter = OpenMaya.MItMeshVertex(mesh)
-    while not vertex_iter.isDone():
-        vertex_id = vertex_iter.index()
-        normals = vertex_iter.getNormals()
-        if not normals:
-            vertex_iter.next()
-            continue
-        if vertex_id not in data['normals']:
-            data['normals'][vertex_id] = list()
+    data['normals'] = buffer.from_vector_array(mfn_mesh.getNormals())
+    counts, vertices = mfn_mesh.getVertices()
+    data['counts'] = buffer.from_int_array(counts)
+    data['vertices'] = buffer.from_int_array(vertices)
+    data['ids'] = buffer.from_int_array(mfn_mesh.getNormalIds()[1])
 
-        [data['normals'][vertex_id].append(tuple(normal)) for normal in normals]
-        data['faces'][vertex_id] = list(vertex_iter.getConnectedFaces())
+    data['locked'] = _locked(mfn_mesh, data['ids'], len(data['normals']))
+    data['smooth'] = _smooth(mfn_mesh)
+    return data
 
-        vertex_iter.next()
 
-    return data
+def _legacy_arrays(data):
+    """
+    Files from before the bulk capture store {vertex: [normals]} and {vertex: [faces]}.
+
+    :return: normal, face and vertex of every face vertex
+    :rtype: tuple(numpy.ndarray, numpy.ndarray, numpy.ndarray)
+    """
+    faces_by_vertex = data['faces']
+    if isinstance(faces_by_vertex, list):
+        faces_by_vertex = dict(zip(data['normals'].keys(), faces_by_vertex))
+
+    normals, faces, vertices = list(), list(), list()
+    for vtx_id, vtx_normals in data['normals'].items():
+        vtx_faces = faces_by_vertex.get(vtx_id, faces_by_vertex.get(str(vtx_id), []))
+        pairs = list(zip(vtx_normals, vtx_faces))
+        normals.extend(normal for normal, _ in pairs)
+        faces.extend(face for _, face in pairs)
+        vertices.extend([int(vtx_id)] * len(pairs))
+    return (np.array(normals, dtype=np.float64).reshape(-1, 3), np.array(faces, dtype=np.int32),
+            np.array(vertices, dtype=np.int32))
 
 
 @decorator.timer()
-def load(data=None, name=None):
+def load(data=None, name=None, mmap=False):
+    """
+    :param NormalData data: the previous per vertex dict files are read as well
+    :param str name: geometry to load the normals on, defaults to the one stored
+    :param bool mmap: when loading from file, keeps the '.mdata' payloads mapped instead of reading them as lists
+    """
     if not data:
         data = NormalData()
-        data.load()
+        data.load(mmap=mmap)
 
     if name:
         data['geometry'] = name
@@ -42,29 +119,40 @@ def load(data=None, name=None):
     mfn_mesh = OpenMaya.MSelectionList().add(data['geometry']).getDagPath(0)
     mfn_mesh = OpenMaya.MFnMesh(mfn_mesh)
 
-    all_normals = OpenMaya.MVectorArray()
-    all_faces = OpenMaya.MIntArray()
-    all_vertices = OpenMaya.MIntArray()
-
-    faces_by_vertex = data['faces']
-    if isinstance(faces_by_vertex, list):
-        faces_by_vertex = dict(zip(data['normals'].keys(), faces_by_vertex))
-
-    for vtx_id, normals in data['normals'].items():
-        faces = faces_by_vertex.get(vtx_id, faces_by_vertex.get(str(vtx_id), []))
-        vtx_id_int = int(vtx_id)
-        for normal, face in zip(normals, faces):
-            all_normals.append(OpenMaya.MVector(normal))
-            all_faces.append(face)
-            all_vertices.append(vtx_id_int)
-
-    mfn_mesh.setFaceVertexNormals(all_normals, all_faces, all_vertices)
-    cmds.polyNormal(data['geometry'], nm=2, unm=0, ch=0)
+    if isinstance(data['normals'], dict):
+        normals, faces, vertices = _legacy_arrays(data)
+        mfn_mesh.setFaceVertexNormals(buffer.to_vector_array(normals), buffer.to_int_array(faces),
+                                      buffer.to_int_array(vertices))
+        cmds.polyNormal(data['geometry'], nm=2, unm=0, ch=0)
+        return
+
+    # Edge smoothing first, the unlocked normals are recomputed from it
+    smooth = buffer.as_array(data['smooth'], bool)
+    mfn_mesh.setEdgeSmoothings(buffer.to_int_array(np.arange(len(smooth))), smooth.tolist())
+    mfn_mesh.cleanupEdgeSmoothing()
+
+    counts = buffer.as_array(data['counts'], np.int64)
+    faces = np.repeat(np.arange(len(counts)), counts)
+    vertices = buffer.as_array(data['vertices'], np.int64)
+    ids = buffer.as_array(data['ids'], np.int64)
+    normals = buffer.as_array(data['normals'], np.float64, 3)[ids]
+
+    # setFaceVertexNormals locks everything it sets
+    mfn_mesh.setFaceVertexNormals(buffer.to_vector_array(normals), buffer.to_int_array(faces),
+                                  buffer.to_int_array(vertices))
+    unlocked = ~buffer.as_array(data['locked'], bool)[ids]
+    if unlocked.any():
+        mfn_mesh.unlockFaceVertexNormals(buffer.to_int_array(faces[unlocked]), buffer.to_int_array(vertices[unlocked]))
+    mfn_mesh.updateSurface()
 
 
 class NormalData(BaseData):
     def __init__(self):
         super(NormalData, self).__init__()
         self['geometry'] = str()
-        self['normals'] = dict()
-        self['faces'] = dict()
+        self['normals'] = list()  # (N, 3) unique normals
+        self['ids'] = list()  # normal id of every face vertex
+        self['counts'] = list()  # vertices per face
+        self['vertices'] = list()  # vertex id of every face vertex
+        self['locked'] = list()  # per normal
+        self['smooth'] = list()  # per edge
@@ -1,14 +1,20 @@
 from MayaData.data.base import BaseData
 from MayaData.data.tree import Tree
-from MayaData.lib import hash, decorator
+from MayaData.lib import hash, decorator, undo
+from MayaData.lib import rename as rename_lib
 
-from maya.api import OpenMaya
+from maya.api import OpenMaya, OpenMayaAnim
+from maya import cmds
 
-import copy
+import collections
+import itertools
+import numpy as np
 
 DEFAULT_DATA = {'name': str(), 'matrix': None, 'orient': list(), 'rotation': list(), 'radius': float(),
                 'rotateOrder': float(), 'side': float(), 'type': float()}
 
+_ATTRIBUTES = dict()
+
 
 def _traverse_to_root(joint):
     obj = OpenMaya.MSelectionList().add(joint).getDependNode(0)
@@ -18,85 +24,88 @@ def _traverse_to_root(joint):
     return obj_mfn.object()
 
 
-def _get_attributes(joint, include_namespace):
-    mfn_node = OpenMaya.MFnTransform(joint)
-    jnt_name = mfn_node.partialPathName()
-    if not include_namespace:
-        jnt_name = jnt_name.split(':')[-1]
-    data = copy.deepcopy(DEFAULT_DATA)
-    data['name'] = jnt_name
-    data['matrix'] = list(mfn_node.transformationMatrix())
-
-    orient_plug = mfn_node.findPlug('jointOrient', False)
-    for i in range(orient_plug.numChildren()):
-        data['orient'].append(orient_plug.child(i).asDouble())
-    for j in ['rx', 'ry', 'rz']:
-        data['rotation'].append(mfn_node.findPlug(j, False).asDouble())
-    for k in ['radius', 'rotateOrder', 'side', 'type']:
-        data[k] = mfn_node.findPlug(k, False).asDouble()
+def _joint_attribute(name):
+    """
+    Attribute MObjects are resolved once per session and shared by every joint.
 
-    return data
+    :rtype: OpenMaya.MObject
+    """
+    if name not in _ATTRIBUTES:
+        _ATTRIBUTES[name] = OpenMaya.MNodeClass('joint').attribute(name)
+    return _ATTRIBUTES[name]
 
 
-def _set_attributes(joint, attributes):
-    mfn_node = OpenMaya.MFnTransform(joint)
+# Read in this order for every joint: orient, rotation, then the FlatSkeletonData.SCALARS
+_CAPTURED = ('jointOrientX', 'jointOrientY', 'jointOrientZ', 'rotateX', 'rotateY', 'rotateZ',
+             'radius', 'rotateOrder', 'side', 'type')
 
-    matrix = OpenMaya.MMatrix(attributes['matrix'])
-    matrix = OpenMaya.MTransformationMatrix(matrix)
 
-    translation = matrix.translation(OpenMaya.MSpace.kWorld)
-    for i, translate in zip(['tx', 'ty', 'tz'], [translation.x, translation.y, translation.z]):
-        mfn_node.findPlug(i, False).setDouble(translate)
+def _read_values(obj, attributes):
+    return [OpenMaya.MPlug(obj, attr).asDouble() for attr in attributes]
 
-    for j, rotate in zip(attributes['rotation'], ['rx', 'ry', 'rz']):
-        mfn_node.findPlug(rotate, False).setDouble(j)
 
-    orient_plug = mfn_node.findPlug('jointOrient', False)
-    for k, orient in zip(attributes['orient'], range(orient_plug.numChildren())):
-        orient_plug.child(orient).setDouble(k)
+def _as_joint(name, matrix, values):
+    return {'name': name, 'matrix': list(matrix), 'orient': values[0:3], 'rotation': values[3:6],
+            'radius': values[6], 'rotateOrder': values[7], 'side': values[8], 'type': values[9]}
 
-    mfn_node.findPlug('radius', False).setDouble(attributes['radius'])
 
-    for l in ['rotateOrder', 'side', 'type']:
-        mfn_node.findPlug(l, False).setInt(int(attributes[l]))
+def _world_transform(dag_path):
+    """
+    :return: world matrix, rotation and a zero orient, used when the capture doesn't start at the root
+    """
+    m_matrix = dag_path.inclusiveMatrix()
+    rotation = OpenMaya.MTransformationMatrix(m_matrix).rotation()
+    return list(m_matrix), [OpenMaya.MAngle(angle).asRadians() for angle in rotation], [0.0, 0.0, 0.0]
 
 
-@decorator.timer()
-def get(name, from_root=True, include_namespace=True):
+def _iter_joints(name, from_root):
     obj = OpenMaya.MSelectionList().add(name).getDependNode(0)
     if from_root:
         obj = _traverse_to_root(name)
 
     dag_iter = OpenMaya.MItDag(OpenMaya.MItDag.kBreadthFirst, OpenMaya.MFn.kJoint)
     dag_iter.reset(obj)
+    while not dag_iter.isDone():
+        if dag_iter.currentItem().hasFn(OpenMaya.MFn.kJoint):
+            yield dag_iter
+        dag_iter.next()
+
+
+@decorator.timer()
+def get(name, from_root=True, include_namespace=True, rename=None):
+    """
+    :param str name: any joint of the skeleton
+    :param bool from_root: starts from the root of the hierarchy instead of the given joint
+    :param bool include_namespace:
+    :param rename: rename.Renamer, dict or callable applied to the captured names
+    :rtype: SkeletonData
+    """
+    renamer = rename_lib.as_renamer(rename)
+    attributes = [_joint_attribute(attr) for attr in _CAPTURED]
+    mfn_node = OpenMaya.MFnTransform()
     data = SkeletonData()
 
     first_item = None
 
-    while not dag_iter.isDone():
-        if not dag_iter.currentItem().hasFn(OpenMaya.MFn.kJoint):
-            dag_iter.next()
-            continue
-
+    for dag_iter in _iter_joints(name, from_root):
+        jnt_obj = dag_iter.currentItem()
         full_name = dag_iter.fullPathName()
         name_parts = full_name.split('|')[1:]
-        attrs = _get_attributes(dag_iter.currentItem(), include_namespace)
+
+        jnt_name = dag_iter.partialPathName()
+        if not include_namespace:
+            jnt_name = jnt_name.split(':')[-1]
+        if renamer:
+            jnt_name = renamer(jnt_name)
+        mfn_node.setObject(jnt_obj)
+        attrs = _as_joint(jnt_name, mfn_node.transformationMatrix(), _read_values(jnt_obj, attributes))
 
         if first_item is None:
             first_item = name_parts
             if not from_root:
                 # Then we need to get world transformations
-                m_matrix = dag_iter.getPath().inclusiveMatrix()
-                attrs['matrix'] = list(m_matrix)
+                attrs['matrix'], attrs['rotation'], attrs['orient'] = _world_transform(dag_iter.getPath())
 
-                rotation = OpenMaya.MTransformationMatrix(m_matrix).rotation()
-                attrs['rotation'] = [OpenMaya.MAngle(angle).asRadians() for angle in rotation]
-                attrs['orient'] = [0, 0, 0]
-            
-
-        jnt_name = dag_iter.partialPathName()
-        if not include_namespace:
-            jnt_name = jnt_name.split(':')[-1]
         data['joints'].append(jnt_name)
 
         if not from_root:
@@ -104,42 +113,296 @@ def get(name, from_root=True, include_namespace=True):
             while i < len(first_item) and i < len(name_parts) and name_parts[i] == first_item[i]:
                 i += 1
             full_name = '|'.join(name_parts[i - 1:] if i > 0 else name_parts)
+        if renamer:
+            full_name = '|'.join(renamer(part) for part in full_name.split('|'))
 
         data.get_bone(full_name, attrs)
-        dag_iter.next()
 
     return data
 
 
-def _build_hierarchy(joint_data, parent=None):
-    if not isinstance(joint_data, dict):
-        return
+@decorator.timer()
+def get_flat(name, from_root=True, include_namespace=True, rename=None):
+    """
+    Captures the hierarchy straight into arrays, one row per joint in breadth first order.
+
+    :param str name: any joint of the skeleton
+    :param bool from_root: starts from the root of the hierarchy instead of the given joint
+    :param bool include_namespace:
+    :param rename: rename.Renamer, dict or callable applied to the captured names
+    :rtype: FlatSkeletonData
+    """
+    attributes = [_joint_attribute(attr) for attr in _CAPTURED]
+    mfn_node = OpenMaya.MFnTransform()
+    names, parents, matrices, values = list(), list(), list(), list()
+    rows = dict()
+
+    for dag_iter in _iter_joints(name, from_root):
+        jnt_obj = dag_iter.currentItem()
+        full_name = dag_iter.fullPathName()
+
+        # Closest joint above, non joint transforms in between are skipped
+        parent = full_name.rpartition('|')[0]
+        while parent and parent not in rows:
+            parent = parent.rpartition('|')[0]
+        parents.append(rows.get(parent, -1))
+        rows[full_name] = len(names)
+
+        jnt_name = dag_iter.partialPathName()
+        names.append(jnt_name if include_namespace else jnt_name.split(':')[-1])
+        mfn_node.setObject(jnt_obj)
+        matrices.append(mfn_node.transformationMatrix())
+        values.append(_read_values(jnt_obj, attributes))
+
+        if not from_root and len(names) == 1:
+            matrix, rotation, orient = _world_transform(dag_iter.getPath())
+            matrices[0] = matrix
+            values[0][0:6] = orient + rotation
+
+    renamer = rename_lib.as_renamer(rename)
+    if renamer:
+        names = renamer.map(names)
+
+    data = FlatSkeletonData()
+    values = np.array(values, dtype=np.float64).reshape(-1, len(_CAPTURED))
+    data['names'] = names
+    data['parents'] = np.array(parents, dtype=np.int32)
+    data['matrices'] = np.fromiter(itertools.chain.from_iterable(matrices), dtype=np.float64,
+                                   count=16 * len(matrices)).reshape(-1, 4, 4)
+    data['orients'] = values[:, 0:3].copy()
+    data['rotations'] = values[:, 3:6].copy()
+    for i, key in enumerate(FlatSkeletonData.SCALARS):
+        data[key] = values[:, 6 + i].copy()
+    return data
+
+
+def _flatten(data):
+    """
+    Walks the nested joints breadth first without recursion, so parents always come before their children.
+
+    :param dict data: SkeletonData
+    :return: parent index of every joint, -1 for the roots, and its attributes
+    :rtype: tuple(list, list)
+    """
+    parents, attributes = list(), list()
+    queue = collections.deque((child, -1) for child in data.values() if isinstance(child, dict))
+    while queue:
+        joint_data, parent = queue.popleft()
+        parents.append(parent)
+        attributes.append(joint_data)
+        index = len(attributes) - 1
+        queue.extend((child, index) for child in joint_data.values() if isinstance(child, dict))
+    return parents, attributes
+
+
+@decorator.timer()
+def _create_joints(parents, names):
+    """
+    Creates, parents and renames every joint in a single modifier.
+
+    :rtype: list(OpenMaya.MObject)
+    """
     mod = OpenMaya.MDagModifier()
-    jnt_obj = mod.createNode('joint', OpenMaya.MObject.kNullObj)
-    
-    if parent:
-        mod.reparentNode(jnt_obj, parent)
-        
-    mod.renameNode(jnt_obj, joint_data['name'])
+    joints = list()
+    for parent, name in zip(parents, names):
+        jnt_obj = mod.createNode('joint', joints[parent] if parent >= 0 else OpenMaya.MObject.kNullObj)
+        mod.renameNode(jnt_obj, name)
+        joints.append(jnt_obj)
+    mod.doIt()
+    return joints
+
+
+@decorator.timer()
+def _set_plugs(joints, attributes):
+    # Scalar attributes of every joint go through one modifier, rotateOrder has to be in before the rotations
+    mod = OpenMaya.MDGModifier()
+    radius = _joint_attribute('radius')
+    enums = [(key, _joint_attribute(key)) for key in ('rotateOrder', 'side', 'type')]
+    for jnt_obj, data in zip(joints, attributes):
+        mod.newPlugValueDouble(OpenMaya.MPlug(jnt_obj, radius), data['radius'])
+        for key, attr in enums:
+            mod.newPlugValueInt(OpenMaya.MPlug(jnt_obj, attr), int(data[key]))
     mod.doIt()
 
-    _set_attributes(jnt_obj, joint_data)
 
-    for val in joint_data.values():
-        _build_hierarchy(val, jnt_obj)
+@decorator.timer()
+def _set_transforms(joints, attributes):
+    for jnt_obj, data in zip(joints, attributes):
+        mfn_joint = OpenMayaAnim.MFnIkJoint(jnt_obj)
+        matrix = OpenMaya.MTransformationMatrix(OpenMaya.MMatrix(data['matrix']))
+        mfn_joint.setTranslation(matrix.translation(OpenMaya.MSpace.kWorld), OpenMaya.MSpace.kTransform)
+        mfn_joint.setOrientation(OpenMaya.MEulerRotation(*data['orient']))
+        mfn_joint.setRotation(OpenMaya.MEulerRotation(*data['rotation'], int(data['rotateOrder'])),
+                              OpenMaya.MSpace.kTransform)
+
+
+def build(parents, attributes):
+    """
+    :param list parents: parent index of every joint, parents first
+    :param list attributes: DEFAULT_DATA like dict of every joint
+    :return: the joints created
+    :rtype: list(OpenMaya.MObject)
+    """
+    joints = _create_joints(parents, [data['name'] for data in attributes])
+    _set_plugs(joints, attributes)
+    _set_transforms(joints, attributes)
+    return joints
+
+
+def _as_flat(data):
+    """
+    :param data: SkeletonData, FlatSkeletonData or a flat file read into any BaseData, ie SkeletonData().load()
+    :rtype: FlatSkeletonData
+    """
+    if isinstance(data, FlatSkeletonData):
+        return data
+    if 'parents' not in data:
+        return FlatSkeletonData.from_tree(data)
+    flat = FlatSkeletonData()
+    flat.update((key, data[key]) for key in flat if key in data)
+    return flat
 
 
 @decorator.timer()
-def load(data=None):
+def load(data=None, rename=None):
+    """
+    :param data: SkeletonData or FlatSkeletonData
+    :param rename: rename.Renamer, dict or callable applied to the joint names
+    """
     if not data:
         data = SkeletonData()
         data.load()
 
-    for val in data.values():
-        _build_hierarchy(val)
+    parents, attributes = _as_flat(data).records() if 'parents' in data else _flatten(data)
+    renamer = rename_lib.as_renamer(rename)
+    if renamer:
+        attributes = [dict(joint, name=renamer(joint['name'])) for joint in attributes]
+    build(parents, attributes)
     return data
 
 
+def _scene_names(names, namespace=None, rename=None):
+    """
+    :return: the stored names as found in the scene, namespace swapped first then renamed
+    :rtype: list
+    """
+    renamer = rename_lib.as_renamer(rename)
+    rules = [rename_lib.Namespace(namespace)] if namespace is not None else list()
+    rules += renamer.rules if renamer else list()
+    return rename_lib.Renamer(*rules).map(list(names))
+
+
+def _find_joint(name):
+    selection = OpenMaya.MSelectionList()
+    try:
+        selection.add(name)
+    except RuntimeError:
+        return None
+    dag = selection.getDagPath(0)
+    return dag if dag.hasFn(OpenMaya.MFn.kJoint) else None
+
+
+# Joint labels compared by diff and set by patch
+_LABELS = ('side', 'type')
+
+
+@decorator.timer()
+def diff(data, namespace=None, tolerance=1.0e-4, rename=None):
+    """
+    Compares the joints of the data against the ones in the scene with the same name.
+
+    :param data: SkeletonData or FlatSkeletonData, flat files read through SkeletonData are wrapped
+    :param str namespace: replaces the namespace of the stored names, '' strips it, None keeps the names as they are
+    :param float tolerance: matrix, orient and rotation differences below it are ignored
+    :param rename: rename.Renamer, dict or callable applied to the stored names after the namespace
+    :return: rows of the joints to create, to reparent and whose transform or side/type labels changed,
+        parents first
+    :rtype: dict
+    """
+    data = _as_flat(data)
+    order = data.order()
+    parents = np.asarray(data['parents'], dtype=np.int64)
+    matrices = np.asarray(data['matrices'], dtype=np.float64).reshape(-1, 16)
+    orients = np.asarray(data['orients'], dtype=np.float64).reshape(-1, 3)
+    rotations = np.asarray(data['rotations'], dtype=np.float64).reshape(-1, 3)
+    labels = np.column_stack([np.asarray(data[key], dtype=np.int64) for key in _LABELS])
+
+    dags = [_find_joint(name) for name in _scene_names(data['names'], namespace, rename)]
+    changes = {'create': list(), 'reparent': list(), 'transform': list()}
+    for row in order.tolist():
+        dag = dags[row]
+        if dag is None:
+            changes['create'].append(row)
+            continue
+
+        parent = parents[row]
+        # Roots stay wherever the rig put them, only parents stored in the data are enforced
+        if parent >= 0:
+            expected = dags[parent]
+            if expected is None or OpenMaya.MFnDagNode(dag).parent(0) != expected.node():
+                changes['reparent'].append(row)
+                continue
+
+        mfn_joint = OpenMayaAnim.MFnIkJoint(dag)
+        orient = mfn_joint.getOrientation()
+        rotation = mfn_joint.rotation(OpenMaya.MSpace.kTransform)
+        if not (np.allclose(list(mfn_joint.transformationMatrix()), matrices[row], atol=tolerance) and
+                np.allclose((orient.x, orient.y, orient.z), orients[row], atol=tolerance) and
+                np.allclose((rotation.x, rotation.y, rotation.z), rotations[row], atol=tolerance) and
+                [OpenMaya.MPlug(dag.node(), _joint_attribute(key)).asInt() for key in _LABELS] == labels[row].tolist()):
+            changes['transform'].append(row)
+    return changes
+
+
+def _set_joint(name, joint):
+    # cmds takes ui units, the data holds internal ones
+    distance = OpenMaya.MDistance.uiUnit()
+    angle = OpenMaya.MAngle.uiUnit()
+    translate = [OpenMaya.MDistance(value).asUnits(distance) for value in joint['matrix'][12:15]]
+    cmds.setAttr('{}.rotateOrder'.format(name), int(joint['rotateOrder']))
+    cmds.setAttr('{}.translate'.format(name), *translate)
+    cmds.setAttr('{}.jointOrient'.format(name), *[OpenMaya.MAngle(value).asUnits(angle) for value in joint['orient']])
+    cmds.setAttr('{}.rotate'.format(name), *[OpenMaya.MAngle(value).asUnits(angle) for value in joint['rotation']])
+    cmds.setAttr('{}.radius'.format(name), joint['radius'])
+    for key in _LABELS:
+        cmds.setAttr('{}.{}'.format(name, key), int(joint[key]))
+
+
+@decorator.timer()
+def patch(data, changes=None, namespace=None, tolerance=1.0e-4, rename=None):
+    """
+    Updates the scene skeleton in place, in a single undo chunk. Joints that didn't change aren't touched.
+
+    :param data: SkeletonData or FlatSkeletonData
+    :param dict changes: result of diff, computed when not given
+    :param str namespace: see diff
+    :param float tolerance: see diff
+    :param rename: see diff
+    :return: the changes applied
+    :rtype: dict
+    """
+    data = _as_flat(data)
+    if changes is None:
+        changes = diff(data, namespace, tolerance, rename)
+    names = _scene_names(data['names'], namespace, rename)
+    parents = data['parents']
+
+    with undo.UndoContext():
+        for row in changes['create']:
+            parent = int(parents[row])
+            if parent >= 0:
+                cmds.createNode('joint', name=names[row], parent=names[parent], skipSelect=True)
+                continue
+            cmds.createNode('joint', name=names[row], skipSelect=True)
+
+        for row in changes['reparent']:
+            cmds.parent(names[row], names[int(parents[row])], relative=True)
+
+        for row in changes['create'] + changes['reparent'] + changes['transform']:
+            _set_joint(names[row], data.joint(row))
+    return changes
+
+
 class SkeletonData(BaseData, Tree):
     def __init__(self, *args, **kwargs):
         super(SkeletonData, self).__init__(*args, **kwargs)
@@ -147,6 +410,118 @@ class SkeletonData(BaseData, Tree):
 
     def get_bone(self, full_path_name, attributes):
         int_name = hash.string_to_int(full_path_name)
-        print(full_path_name)
         self.custom_node = attributes
         self.add_node(*int_name)
+
+
+class FlatSkeletonData(BaseData):
+    """
+    Array backed skeleton, one row per joint in every array and parents stored as indices.
+    """
+    SCALARS = ('radius', 'rotateOrder', 'side', 'type')
+
+    def __init__(self):
+        super(FlatSkeletonData, self).__init__()
+        self['names'] = list()
+        self['parents'] = list()  # index of the parent joint, -1 for the roots
+        self['matrices'] = list()  # (N, 4, 4) local transformation matrices
+        self['orients'] = list()  # (N, 3)
+        self['rotations'] = list()  # (N, 3)
+        for key in self.SCALARS:
+            self[key] = list()
+        self._lookup = dict()
+
+    @property
+    def count(self):
+        return len(self['names'])
+
+    def index(self, name):
+        """
+        :param str name: joint name
+        :return: row of the joint, the lookup is checked against the names and rebuilt whenever they changed,
+            in place or not
+        :rtype: int
+        """
+        names = self['names']
+        row = self._lookup.get(name)
+        if row is None or row >= len(names) or names[row] != name:
+            # Reversed so a name held twice gives its first row, like list.index
+            self._lookup = {joint: i for i, joint in reversed(list(enumerate(names)))}
+            row = self._lookup[name]
+        return row
+
+    def order(self):
+        """
+        :return: rows sorted so every parent comes before its children
+        :rtype: numpy.ndarray
+        """
+        parents = np.asarray(self['parents'], dtype=np.int64)
+        depth = np.zeros(len(parents), dtype=np.int64)
+        current = parents.copy()
+        # Every pass climbs one level for all joints at once
+        while (current >= 0).any():
+            climbing = current >= 0
+            depth[climbing] += 1
+            current[climbing] = parents[current[climbing]]
+        return np.argsort(depth, kind='stable')
+
+    def joint(self, index):
+        """
+        :param int index:
+        :return: the joint as the DEFAULT_DATA dict used by the nested layout
+        :rtype: dict
+        """
+        data = {'name': self['names'][index],
+                'matrix': np.asarray(self['matrices'][index], dtype=np.float64).ravel().tolist(),
+                'orient': np.asarray(self['orients'][index], dtype=np.float64).tolist(),
+                'rotation': np.asarray(self['rotations'][index], dtype=np.float64).tolist()}
+        for key in self.SCALARS:
+            data[key] = float(self[key][index])
+        return data
+
+    def records(self):
+        """
+        :return: parent index and attributes of every joint, in building order
+        :rtype: tuple(list, list)
+        """
+        order = self.order()
+        new_index = np.empty(len(order), dtype=np.int64)
+        new_index[order] = np.arange(len(order))
+        parents = np.asarray(self['parents'], dtype=np.int64)[order]
+        parents = np.where(parents >= 0, new_index[np.maximum(parents, 0)], -1)
+        return parents.tolist(), [self.joint(i) for i in order]
+
+    @classmethod
+    def from_records(cls, parents, attributes):
+        data = cls()
+        data['names'] = [joint['name'] for joint in attributes]
+        data['parents'] = np.asarray(parents, dtype=np.int32)
+        data['matrices'] = np.array([joint['matrix'] for joint in attributes], dtype=np.float64).reshape(-1, 4, 4)
+        data['orients'] = np.array([joint['orient'] for joint in attributes], dtype=np.float64).reshape(-1, 3)
+        data['rotations'] = np.array([joint['rotation'] for joint in attributes], dtype=np.float64).reshape(-1, 3)
+        for key in cls.SCALARS:
+            data[key] = np.array([joint[key] for joint in attributes], dtype=np.float64)
+        return data
+
+    @classmethod
+    def from_tree(cls, tree):
+        """
+        :param SkeletonData tree: nested layout
+        :rtype: FlatSkeletonData
+        """
+        return cls.from_records(*_flatten(tree))
+
+    def to_tree(self):
+        """
+        :return: the nested layout, keyed by the hashed path of every joint
+        :rtype: SkeletonData
+        """
+        tree = SkeletonData()
+        paths = dict()
+        for index in self.order():
+            parent = int(self['parents'][index])
+            name = self['names'][index]
+            paths[index] = '{}|{}'.format(paths[parent], name) if parent >= 0 else name
+            tree.get_bone(paths[index], self.joint(index))
+            tree['joints'].append(name)
+        return tree
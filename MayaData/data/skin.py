@@ -1,11 +1,11 @@
 from MayaData.data.base import BaseData
-from MayaData.lib import decorator
+from MayaData.lib import decorator, deformer, influence
+from MayaData.lib import rename as rename_lib
 
 from maya.api import OpenMaya, OpenMayaAnim
 from maya import cmds
 
 import numpy as np
-import pandas as pd
 
 
 def copy(source, target):
@@ -15,7 +15,7 @@ def copy(source, target):
     if target_skin:
         cmds.skinCluster(OpenMaya.MFnDependencyNode(target_skin).name(), edit=True, unbind=True, unbindKeepHistory=False)
 
-    cmds.skinCluster(list(source_skin['influences'].values()), target,
+    cmds.skinCluster(source_skin['influences'], target,
                                 bindMethod=1, mi=source_skin['max_influence'], tsb=True)
     cmds.copySkinWeights(source, target, nm=True, sa='closestPoint', ia=['closestJoint'])
 
@@ -24,105 +24,355 @@ def get_skin_cluster(mesh):
     """
     :param str mesh:
     :return: Skin cluster attached to the mesh
-    :rtype: str/None
+    :rtype: OpenMaya.MObject/None
     """
-    dag = OpenMaya.MSelectionList().add(mesh).getDagPath(0)
-    dag = dag.extendToShape()
-    obj = dag.node()
+    return deformer.find(mesh, OpenMaya.MFn.kSkinClusterFilter)
 
-    skin = None
-    dag_iter = OpenMaya.MItDependencyGraph(obj,
-                                           OpenMaya.MItDependencyGraph.kDownstream,
-                                           OpenMaya.MItDependencyGraph.kPlugLevel)
-    while not dag_iter.isDone():
-        current_item = dag_iter.currentNode()
-        if current_item.hasFn(OpenMaya.MFn.kSkinClusterFilter):
-            skin = current_item
-            break
-        dag_iter.next()
-    return skin
 
+def keep_influences(skin_data, influences_to_keep, base_joint=None, by_hierarchy=False):
+    """
+    :param dict skin_data: any layout read by as_sparse
+    :param list influences_to_keep:
+    :param str base_joint: receives the weights of every removed influence
+    :param bool by_hierarchy: without base_joint, removed weights go to their closest kept ancestor in the scene
+    :return: the sparse skin data without the removed influences
+    :rtype: SkinData
+    """
+    skin_data = SkinData(as_sparse(skin_data))
+    parents = influence.get_parents(skin_data['influences']) if by_hierarchy and not base_joint else None
+    return influence.keep(skin_data, influences_to_keep, base_joint, parents)
 
-def keep_influences(skin_data, influences_to_keep, base_joint):
-    skin_data = pd.DataFrame(skin_data)
 
-    remove = [i for i in skin_data.columns if i not in influences_to_keep + [base_joint]]
+def _vertex_component(mesh_path):
+    """
+    :param OpenMaya.MDagPath mesh_path:
+    :return: complete vertex component of the mesh and its vertex count
+    :rtype: tuple(OpenMaya.MObject, int)
+    """
+    count = OpenMaya.MFnMesh(mesh_path).numVertices
+    id_component = OpenMaya.MFnSingleIndexedComponent()
+    vtx_component = id_component.create(OpenMaya.MFn.kMeshVertComponent)
+    id_component.setCompleteData(count)
+    return vtx_component, count
 
-    skin_data.drop(remove, axis=1, inplace=True)
 
-    for index, row in skin_data.iterrows():
-        difference = 1.0 - row.sum()
-        skin_data.at[index, base_joint] += difference
+def _rows(offsets):
+    offsets = np.asarray(offsets, dtype=np.int64)
+    return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
 
-    return skin_data.to_dict(orient='list')
 
+def from_dense(weights, tolerance=1.0e-6):
+    """
+    :param numpy.ndarray weights: (vertices, influences) matrix
+    :param float tolerance: weights below it are dropped
+    :return: offsets, indices and weights of the CSR layout
+    :rtype: tuple(numpy.ndarray, numpy.ndarray, numpy.ndarray)
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    rows, columns = np.nonzero(weights > tolerance)
+    offsets = np.zeros(weights.shape[0] + 1, dtype=np.int32)
+    np.cumsum(np.bincount(rows, minlength=weights.shape[0]), out=offsets[1:])
+    return offsets, columns.astype(np.int32), weights[rows, columns]
 
-@decorator.timer()
-def get(name):
 
-    data = SkinData()
-    mfn_skin = get_skin_cluster(name)
-    mfn_skin = OpenMayaAnim.MFnSkinCluster(mfn_skin)
+def to_dense(data, num_influences=None):
+    """
+    :param SkinData data: sparse layout
+    :param int num_influences: number of columns, defaults to the influences stored
+    :return: (vertices, influences) matrix
+    :rtype: numpy.ndarray
+    """
+    offsets = np.asarray(data['offsets'], dtype=np.int64)
+    if num_influences is None:
+        num_influences = len(data['influences'])
+    dense = np.zeros((len(offsets) - 1, num_influences), dtype=np.float64)
+    dense[_rows(offsets), np.asarray(data['indices'], dtype=np.int64)] = data['weights']
+    return dense
 
-    mesh_path = mfn_skin.getPathAtIndex(0)
-    mesh_node = mesh_path.node()
 
-    vertex_mfn = OpenMaya.MItMeshVertex(mesh_node)
-    indices = range(vertex_mfn.count())
+def prune(data, max_influence, normalize=True):
+    """
+    Keeps the heaviest max_influence weights of every vertex.
 
-    id_component = OpenMaya.MFnSingleIndexedComponent()
-    vtx_component = id_component.create(OpenMaya.MFn.kMeshVertComponent)
-    id_component.addElements(indices)
+    :param SkinData data: sparse layout, edited in place
+    :param int max_influence:
+    :param bool normalize: rescales every vertex back to a sum of 1.0
+    :return: the same data
+    :rtype: SkinData
+    """
+    offsets = np.asarray(data['offsets'], dtype=np.int64)
+    indices = np.asarray(data['indices'], dtype=np.int32)
+    weights = np.asarray(data['weights'], dtype=np.float64)
+    rows = _rows(offsets)
+
+    if max_influence:
+        # Heaviest first inside every row, the rank is the position relative to the row start
+        order = np.lexsort((-weights, rows))
+        keep = order[np.arange(len(order)) - offsets[rows[order]] < max_influence]
+        keep.sort()
+        rows, indices, weights = rows[keep], indices[keep], weights[keep]
+        offsets = np.zeros_like(offsets)
+        np.cumsum(np.bincount(rows, minlength=len(offsets) - 1), out=offsets[1:])
+        data['max_influence'] = max_influence
+
+    if normalize and len(weights):
+        totals = np.bincount(rows, weights=weights, minlength=len(offsets) - 1)
+        totals[totals == 0.0] = 1.0
+        weights = weights / totals[rows]
+
+    data['offsets'] = offsets.astype(np.int32)
+    data['indices'] = indices
+    data['weights'] = weights
+    return data
 
-    influence_objects = mfn_skin.influenceObjects()
-    influences = [x.partialPathName() for x in influence_objects]
+
+def as_sparse(data):
+    """
+    Reads any of the supported layouts into the sparse one:
+    the current CSR arrays, the dense {influence: [weight per vertex]} dict
+    and the {vertex: {influence_index: weight}} dict used by the templates.
+
+    :param dict data:
+    :rtype: SkinData
+    """
+    if len(data.get('offsets', ())):
+        return data
+
+    sparse = SkinData()
+    sparse['name'] = data.get('name') or str()
+    sparse['geometry'] = data.get('geometry') or str()
+
+    if isinstance(data.get('weights'), dict):
+        influences = data['influences']
+        if isinstance(influences, dict):
+            influences = [influences[key] for key in sorted(influences, key=int)]
+        sparse['influences'] = list(influences)
+
+        vertices = sorted(data['weights'].items(), key=lambda item: int(item[0]))
+        counts = np.fromiter((len(weights) for _, weights in vertices), dtype=np.int32, count=len(vertices))
+        offsets = np.zeros(len(vertices) + 1, dtype=np.int32)
+        np.cumsum(counts, out=offsets[1:])
+        total = int(offsets[-1])
+
+        sparse['offsets'] = offsets
+        sparse['indices'] = np.fromiter((int(index) for _, weights in vertices for index in weights),
+                                        dtype=np.int32, count=total)
+        sparse['weights'] = np.fromiter((weight for _, weights in vertices for weight in weights.values()),
+                                        dtype=np.float64, count=total)
+        sparse['max_influence'] = int(counts.max()) if len(counts) else 0
+        return sparse
+
+    columns = {key: value for key, value in data.items() if key not in SkinData()}
+    sparse['influences'] = list(columns)
+    dense = np.column_stack([np.asarray(column, dtype=np.float64) for column in columns.values()])
+    sparse['offsets'], sparse['indices'], sparse['weights'] = from_dense(dense)
+    sparse['max_influence'] = int(np.diff(sparse['offsets']).max()) if len(dense) else 0
+    return sparse
+
+
+def _read_weights(mfn_skin, tolerance):
+    """
+    :param OpenMayaAnim.MFnSkinCluster mfn_skin:
+    :param float tolerance: weights below it are not stored
+    :return: influence dag paths, offsets, indices and weights
+    :rtype: tuple
+    """
+    mesh_path = mfn_skin.getPathAtIndex(0)
+    vtx_component, count = _vertex_component(mesh_path)
 
     wts, num_inf = mfn_skin.getWeights(mesh_path, vtx_component)
+    wts = np.fromiter(wts, dtype=np.float64, count=count * num_inf).reshape(count, num_inf)
+    return (mfn_skin.influenceObjects(),) + from_dense(wts, tolerance)
+
+
+def _bind(name, influences, max_influence):
+    """
+    Replaces any skin cluster on the mesh by a new one bound to the influences.
+
+    :rtype: OpenMayaAnim.MFnSkinCluster
+    """
+    skin_cluster = get_skin_cluster(name)
+    if skin_cluster:
+        cmds.skinCluster(OpenMaya.MFnDependencyNode(skin_cluster).name(), edit=True, unbind=True, unbindKeepHistory=False)
+
+    skin_cluster = cmds.skinCluster(influences, name, bindMethod=1, mi=max_influence or 4, tsb=True)[0]
+    skin_cluster = OpenMaya.MGlobal.getSelectionListByName(skin_cluster).getDependNode(0)
+    return OpenMayaAnim.MFnSkinCluster(skin_cluster)
+
+
+def _write_weights(skin_mfn, offsets, indices, weights, columns):
+    """
+    :param OpenMayaAnim.MFnSkinCluster skin_mfn:
+    :param numpy.ndarray columns: position in skin_mfn.influenceObjects() of every stored influence index
+    """
+    mesh_path = skin_mfn.getPathAtIndex(0)
+    vtx_component, count = _vertex_component(mesh_path)
+
+    influence_objects = skin_mfn.influenceObjects()
+    influence_index = OpenMaya.MIntArray(len(influence_objects), 0)
+    for x in range(len(influence_objects)):
+        influence_index[x] = int(skin_mfn.indexForInfluenceObject(influence_objects[x]))
+
+    offsets = np.asarray(offsets, dtype=np.int64)
+    dense = np.zeros((count, len(influence_objects)), dtype=np.float64)
+    dense[_rows(offsets), np.asarray(columns, dtype=np.int64)[np.asarray(indices, dtype=np.int64)]] = weights
+    skin_mfn.setWeights(mesh_path, vtx_component, influence_index, OpenMaya.MDoubleArray(dense.ravel()))
+
+
+@decorator.timer()
+def get(name, max_influence=None, tolerance=1.0e-6):
+    """
+    :param str name: skinned mesh
+    :param int max_influence: prunes every vertex down to its heaviest influences and renormalizes
+    :param float tolerance: weights below it are not stored
+    :rtype: SkinData
+    """
+    data = SkinData()
+    mfn_skin = OpenMayaAnim.MFnSkinCluster(get_skin_cluster(name))
+    influence_objects, data['offsets'], data['indices'], data['weights'] = _read_weights(mfn_skin, tolerance)
 
-    skin_data = np.array(wts).reshape(vertex_mfn.count(), num_inf)
-    data.update({influence: skin_data[:, idx].tolist() for idx, influence in enumerate(influences)})
+    data['name'] = mfn_skin.name()
+    data['geometry'] = name
+    data['influences'] = [x.partialPathName() for x in influence_objects]
+    data['max_influence'] = mfn_skin.findPlug('maxInfluences', False).asInt()
 
+    if max_influence:
+        prune(data, max_influence)
     return data
 
 
 @decorator.timer()
-def load(data=None, name=None):
+def load(data=None, name=None, mmap=False, max_influence=None, rename=None):
+    """
+    :param SkinData data: sparse layout, the legacy dense and template layouts are converted
+    :param str name: mesh to bind, defaults to the current selection
+    :param bool mmap: when loading from file, keeps the '.mdata' payloads mapped instead of reading them as lists
+    :param int max_influence: prunes every vertex down to its heaviest influences and renormalizes
+    :param rename: rename.Renamer, dict or callable applied to the influence names
+    """
     if not data:
         data = SkinData()
-        data.load()
+        data.load(mmap=mmap)
+    data = as_sparse(data)
+    if max_influence:
+        data = prune(SkinData(data), max_influence)
 
     if not name:
         name = OpenMaya.MGlobal.getActiveSelectionList().getDependNode(0)
         name = OpenMaya.MFnTransform(name).fullPathName()
 
-    skin_cluster = get_skin_cluster(name)
-    if skin_cluster:
-        cmds.skinCluster(OpenMaya.MFnDependencyNode(skin_cluster).name(), edit=True, unbind=True, unbindKeepHistory=False)
+    influences = list(data['influences'])
+    renamer = rename_lib.as_renamer(rename)
+    if renamer:
+        influences = renamer.map(influences)
+    skin_mfn = _bind(name, influences, data['max_influence'])
 
-    skin_cluster = cmds.skinCluster(list(data.keys()), name, bindMethod=1, mi=4, tsb=True)[0]
-    skin_cluster = OpenMaya.MGlobal.getSelectionListByName(skin_cluster).getDependNode(0)
+    # The skin cluster may order its influences differently, stored columns are remapped by name
+    skin_order = {x.partialPathName(): i for i, x in enumerate(skin_mfn.influenceObjects())}
+    columns = np.array([skin_order[influence] for influence in influences], dtype=np.int64)
+    _write_weights(skin_mfn, data['offsets'], data['indices'], data['weights'], columns)
 
-    skin_mfn = OpenMayaAnim.MFnSkinCluster(skin_cluster)
 
-    mesh_path = skin_mfn.getPathAtIndex(0)
-    mesh_node = mesh_path.node()
+def _skinned_meshes(root):
+    meshes = list()
+    for shape in cmds.listRelatives(root, allDescendents=True, type='mesh', fullPath=True) or list():
+        if cmds.getAttr('{}.intermediateObject'.format(shape)):
+            continue
+        transform = cmds.listRelatives(shape, parent=True, fullPath=True)[0]
+        if transform not in meshes and get_skin_cluster(transform):
+            meshes.append(transform)
+    return meshes
 
-    vertex_mfn = OpenMaya.MItMeshVertex(mesh_node)
-    indices = range(vertex_mfn.count())
 
-    id_component = OpenMaya.MFnSingleIndexedComponent()
-    vtx_component = id_component.create(OpenMaya.MFn.kMeshVertComponent)
-    id_component.addElements(indices)
+@decorator.timer()
+def get_batch(meshes, max_influence=None, tolerance=1.0e-6):
+    """
+    Reads the skinning of many meshes into one archive,
+    influences shared between meshes are resolved and stored once.
 
-    influence_objects = skin_mfn.influenceObjects()
-    influence_index = OpenMaya.MIntArray(len(influence_objects), 0)
-    for x in range(len(influence_objects)):
-        influence_index[x] = int(skin_mfn.indexForInfluenceObject(influence_objects[x]))
+    :param meshes: list of skinned meshes, or the root of a hierarchy to search for them
+    :param int max_influence: prunes every vertex down to its heaviest influences and renormalizes
+    :param float tolerance: weights below it are not stored
+    :rtype: SkinBatchData
+    """
+    if isinstance(meshes, str):
+        meshes = _skinned_meshes(meshes)
+
+    data = SkinBatchData()
+    table = dict()  # influence full path to its index in the shared table
+
+    for mesh in meshes:
+        mfn_skin = OpenMayaAnim.MFnSkinCluster(get_skin_cluster(mesh))
+        influence_objects, offsets, indices, weights = _read_weights(mfn_skin, tolerance)
+
+        local = np.empty(len(influence_objects), dtype=np.int32)
+        for i, path in enumerate(influence_objects):
+            key = path.fullPathName()
+            if key not in table:
+                table[key] = len(data['influences'])
+                data['influences'].append(path.partialPathName())
+            local[i] = table[key]
+
+        block = {'name': mfn_skin.name(),
+                 'max_influence': mfn_skin.findPlug('maxInfluences', False).asInt(),
+                 'influences': local,
+                 'offsets': offsets,
+                 'indices': local[indices],
+                 'weights': weights}
+        if max_influence:
+            prune(block, max_influence)
+        # Shortest unique path, meshes sharing a short name under different parents keep their own block
+        data['meshes'][OpenMaya.MSelectionList().add(mesh).getDagPath(0).partialPathName()] = block
+
+    return data
+
+
+@decorator.timer()
+def load_batch(data=None, mmap=False, meshes=None, rename=None):
+    """
+    :param SkinBatchData data:
+    :param bool mmap: when loading from file, keeps the '.mdata' payloads mapped instead of reading them as lists
+    :param dict meshes: stored mesh name to the scene mesh to bind, defaults to the stored names
+    :param rename: rename.Renamer, dict or callable applied to the influence names and the stored mesh names
+    """
+    if not data:
+        data = SkinBatchData()
+        data.load(mmap=mmap)
+    meshes = meshes or dict()
+    names = list(data['influences'])
+    renamer = rename_lib.as_renamer(rename) or rename_lib.Renamer()
+    names = renamer.map(names)
+
+    # Single pass over the shared table, skin influences are then matched by full path instead of by stored name
+    table = dict()
+    for i, name in enumerate(names):
+        table[OpenMaya.MSelectionList().add(name).getDagPath(0).fullPathName()] = i
 
-    weights = np.array(list(data.values())).T.flatten()
-    skin_mfn.setWeights(mesh_path, vtx_component, influence_index, OpenMaya.MDoubleArray(weights))
+    for mesh, block in data['meshes'].items():
+        influences = [names[i] for i in block['influences']]
+        skin_mfn = _bind(meshes.get(mesh, renamer(mesh)), influences, block['max_influence'])
+
+        columns = np.full(len(data['influences']), -1, dtype=np.int64)
+        for position, path in enumerate(skin_mfn.influenceObjects()):
+            columns[table[path.fullPathName()]] = position
+        _write_weights(skin_mfn, block['offsets'], block['indices'], block['weights'], columns)
 
 
 class SkinData(BaseData):
-    def __init__(self):
+    def __init__(self, *args, **kwargs):
         super(SkinData, self).__init__()
+        self['name'] = str()
+        self['geometry'] = str()
+        self['influences'] = list()
+        self['max_influence'] = int()
+        self['offsets'] = list()  # vertex i owns indices/weights[offsets[i]:offsets[i + 1]]
+        self['indices'] = list()  # into influences
+        self['weights'] = list()
+        self.update(*args, **kwargs)
+
+
+class SkinBatchData(BaseData):
+    def __init__(self):
+        super(SkinBatchData, self).__init__()
+        self['influences'] = list()  # shared by every mesh
+        self['meshes'] = dict()  # mesh name to the SkinData arrays, indices pointing into the shared influences
@@ -1,3 +1,13 @@
+"""
+Nested dict tree, every node is stored under its id in its parent and a node is addressed by the ids
+from the root down to it.
+
+A side index keeps the path of every node, its children ids and the node itself, so lookups don't walk
+the chain of keys and deleting or reparenting only touches the subtree moved. The index isn't serialised,
+the tree still saves as plain nested dicts and is indexed again whenever it's updated, ie after a load.
+"""
+
+
 class Leaf(dict):
     def __init__(self, node_id, *args, **kwargs):
         super(Leaf, self).__init__(*args, **kwargs)
@@ -5,11 +15,16 @@ class Leaf(dict):
         self['id'] = node_id
 
 
+def _is_node(value):
+    return isinstance(value, dict) and 'id' in value
+
+
 class Tree(dict):
-    def __init__(self):
-        super(Tree, self).__init__()
-        self['id'] = 0
+    def __init__(self, *args, **kwargs):
+        super(Tree, self).__init__(*args, **kwargs)
+        self.setdefault('id', 0)
         self._custom = None
+        self.reindex()
 
     @property
     def custom_node(self):
@@ -19,26 +34,145 @@ class Tree(dict):
     def custom_node(self, attributes):
         self._custom = attributes
 
+    def update(self, *args, **kwargs):
+        super(Tree, self).update(*args, **kwargs)
+        self.reindex()
+
+    def _walk(self, path, node):
+        """
+        :return: path and node of every descendant, parents first, without recursion
+        """
+        stack = [(path, node)]
+        while stack:
+            path, node = stack.pop()
+            for child_id in self._children.get(path, ()):
+                child_path = path + (child_id,)
+                child = node[child_id]
+                yield child_path, child
+                stack.append((child_path, child))
+
+    def reindex(self):
+        """
+        Rebuilds the side index from the nested dicts. Children read from json have their keys
+        turned back into ids, so paths built from ids keep matching after a load.
+        """
+        self._index = {(): self}
+        self._children = dict()
+        stack = [((), self)]
+        while stack:
+            path, node = stack.pop()
+            children = [key for key, value in node.items() if _is_node(value)]
+            ids = list()
+            for key in children:
+                child = node[key]
+                if key != child['id']:
+                    del node[key]
+                    node[child['id']] = child
+                ids.append(child['id'])
+                child_path = path + (child['id'],)
+                self._index[child_path] = child
+                stack.append((child_path, child))
+            self._children[path] = ids
+
     def find_node(self, *args):
-        node = self
-        for _id in args:
-            if _id in node.keys():
-                node = node[_id]
-                continue
-        return node
+        """
+        :param args: ids from the root to the node
+        :return: the node, None when it isn't in the tree
+        :rtype: dict/None
+        """
+        return self._index.get(args)
 
-    def delete_node(self, name):
-        pass
+    def children(self, *args):
+        """
+        :return: ids of the direct children of the node
+        :rtype: list
+        """
+        return list(self._children.get(args, ()))
+
+    def subtree(self, *args):
+        """
+        :return: path of every node under the given one, parents first
+        :rtype: list(tuple)
+        """
+        if args not in self._index:
+            return list()
+        return [path for path, _ in self._walk(args, self._index[args])]
 
     def add_node(self, *args):
-        node = self
-        for _id in args:
-            if _id in node.keys():
-                node = node[_id]
-                continue
+        """
+        Creates the missing nodes along the path, custom_node attributes are copied into every new one.
+
+        :return: the last node of the path
+        :rtype: dict
+        """
+        depth = len(args)
+        while depth and args[:depth] not in self._index:
+            depth -= 1
+        node = self._index[args[:depth]]
+
+        for i in range(depth, len(args)):
+            _id = args[i]
             new = Leaf(_id)
             if self._custom:
                 new.update(self._custom)
             new['parent'] = node['id']
             node[_id] = new
+            self._children[args[:i]].append(_id)
+            self._children[args[:i + 1]] = list()
+            self._index[args[:i + 1]] = new
             node = new
+        return node
+
+    def _detach(self, path):
+        node = self._index[path]
+        subtree = [path] + [each for each, _ in self._walk(path, node)]
+        for each in subtree:
+            del self._index[each]
+        children = [self._children.pop(each) for each in subtree]
+
+        parent_path = path[:-1]
+        del self._index[parent_path][path[-1]]
+        self._children[parent_path].remove(path[-1])
+        return node, subtree, children
+
+    def delete_node(self, *args):
+        """
+        Removes the node and everything under it.
+
+        :return: the removed node, None when it isn't in the tree
+        :rtype: dict/None
+        """
+        if not args or args not in self._index:
+            return None
+        return self._detach(args)[0]
+
+    def reparent(self, path, parent_path=()):
+        """
+        :param tuple path: ids of the node to move
+        :param tuple parent_path: ids of its new parent, the root by default
+        :return: the new path of the node
+        :rtype: tuple
+        """
+        path, parent_path = tuple(path), tuple(parent_path)
+        if not path or path not in self._index:
+            raise KeyError('No node at {}'.format(path))
+        if parent_path not in self._index:
+            raise KeyError('No node at {}'.format(parent_path))
+        if parent_path[:len(path)] == path:
+            raise ValueError('Can not parent {} under itself'.format(path))
+
+        parent = self._index[parent_path]
+        if path[-1] in self._children[parent_path]:
+            raise ValueError('{} already has a child {}'.format(parent_path, path[-1]))
+
+        node, subtree, children = self._detach(path)
+        node['parent'] = parent['id']
+        parent[path[-1]] = node
+        self._children[parent_path].append(path[-1])
+
+        new_path = parent_path + (path[-1],)
+        for old, ids in zip(subtree, children):
+            each = new_path + old[len(path):]
+            self._children[each] = ids
+            self._index[each] = self._index[each[:-1]][each[-1]] if each != new_path else node
+        return new_path
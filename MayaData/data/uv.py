@@ -1,62 +1,116 @@
 from MayaData.data.base import BaseData
-from MayaData.lib import decorator
+from MayaData.lib import decorator, buffer
 
 from maya.api import OpenMaya
 from maya import cmds
 
+import numpy as np
+
 
 @decorator.timer()
 def get(name):
+    """
+    :param str name: mesh
+    :return: u, v, counts and ids arrays of every uv set
+    :rtype: UvData
+    """
     dag_obj = OpenMaya.MSelectionList().add(name).getDagPath(0)
     mfn_mesh = OpenMaya.MFnMesh(dag_obj)
-    
+
     data = UvData()
-    uv_count = mfn_mesh.getAssignedUVs()
-    uv_array = mfn_mesh.getUVs()
-    index = 0
-    for i in uv_count[0]:
-        data['indices'].append(list(uv_count[1][index:index + i]))
-        index += i
-    data['vertices'] = [[u, v] for u, v in zip(uv_array[0], uv_array[1])]
     data['geometry'] = name
+    data['current'] = mfn_mesh.currentUVSetName()
+
+    for uv_set in mfn_mesh.getUVSetNames():
+        u_array, v_array = mfn_mesh.getUVs(uv_set)
+        uv_counts, uv_ids = mfn_mesh.getAssignedUVs(uv_set)
+        data['sets'][uv_set] = {'u': buffer.from_float_array(u_array),
+                                'v': buffer.from_float_array(v_array),
+                                'counts': buffer.from_int_array(uv_counts),
+                                'ids': buffer.from_int_array(uv_ids)}
     return data
 
 
+def _flatten_indices(indices):
+    """
+    :param indices: per face uv ids, a (faces, n) array when every face has the same size
+    :return: uv counts and uv ids
+    :rtype: tuple(numpy.ndarray, numpy.ndarray)
+    """
+    if isinstance(indices, np.ndarray):
+        counts = np.full(indices.shape[0], indices.shape[1], dtype=np.int32)
+        return counts, indices.ravel()
+    counts = np.fromiter((len(face) for face in indices), dtype=np.int32, count=len(indices))
+    ids = np.fromiter((uv_id for face in indices for uv_id in face), dtype=np.int32, count=int(counts.sum()))
+    return counts, ids
+
+
+def as_sets(data):
+    """
+    Reads files from before uv sets were stored, the nested 'vertices' and 'indices' lists become map1.
+
+    :param dict data:
+    :rtype: dict
+    """
+    if data.get('sets') or 'vertices' not in data:
+        return data
+    uvs = buffer.as_array(data['vertices'], np.float64, 2)
+    uv_counts, uv_ids = _flatten_indices(data['indices'])
+    data['sets'] = {'map1': {'u': uvs[:, 0], 'v': uvs[:, 1], 'counts': uv_counts, 'ids': uv_ids}}
+    data['current'] = 'map1'
+    return data
+
+
+def get_arrays(data, uv_set=None):
+    """
+    :param UvData data:
+    :param str uv_set: defaults to the current set
+    :return: (N, 2) uvs, uv count per face and face vertex uv ids
+    :rtype: tuple(numpy.ndarray, numpy.ndarray, numpy.ndarray)
+    """
+    data = as_sets(data)
+    uv_data = data['sets'][uv_set or data['current']]
+    uvs = np.column_stack([buffer.as_array(uv_data['u'], np.float64), buffer.as_array(uv_data['v'], np.float64)])
+    return uvs, buffer.as_array(uv_data['counts'], np.int32), buffer.as_array(uv_data['ids'], np.int32)
+
+
 @decorator.timer()
-def load(data=None, name=None):
+def load(data=None, name=None, mmap=False, uv_sets=None):
+    """
+    :param UvData data: flat arrays per uv set, memmap views included, the nested list files are converted
+    :param str name: geometry to load the uvs on, defaults to the one stored
+    :param bool mmap: when loading from file, keeps the '.mdata' payloads mapped instead of reading them as lists
+    :param list uv_sets: only loads these sets, defaults to all of them
+    """
     if not data:
         data = UvData()
-        data.load()
+        data.load(mmap=mmap)
+    data = as_sets(data)
 
     if name:
         data['geometry'] = name
 
     dag_obj = OpenMaya.MSelectionList().add(data['geometry']).getDagPath(0)
     mfn_mesh = OpenMaya.MFnMesh(dag_obj)
-        
-    u_array = [j[0] for j in data["vertices"]]
-    v_array = [j[1] for j in data["vertices"]]
+    existing = mfn_mesh.getUVSetNames()
 
-    uv_counts = []
-    uv_ids = []
+    for uv_set, uv_data in data['sets'].items():
+        if uv_sets and uv_set not in uv_sets:
+            continue
+        if uv_set not in existing:
+            cmds.polyUVSet(data['geometry'], create=True, uvSet=uv_set)
 
-    for uv_faces in data["indices"]:
-        uv_counts.append(len(uv_faces))
-        for uv_face_id in uv_faces:
-            uv_ids.append(uv_face_id)
+        mfn_mesh.clearUVs(uv_set)
+        mfn_mesh.setUVs(buffer.to_float_array(uv_data['u']), buffer.to_float_array(uv_data['v']), uv_set)
+        mfn_mesh.assignUVs(buffer.to_int_array(uv_data['counts']), buffer.to_int_array(uv_data['ids']), uv_set)
 
-    mfn_mesh.clearUVs()
-    uv_set_names = mfn_mesh.getUVSetNames()[0]
-    if len(uv_set_names) == 0:
-        uv_set_names = cmds.polyUVSet(create=True, uvSet="map1")
+    if data['current'] in data['sets']:
+        mfn_mesh.setCurrentUVSetName(data['current'])
 
-    mfn_mesh.setUVs(u_array, v_array, uv_set_names)
-    mfn_mesh.assignUVs(uv_counts, uv_ids, uv_set_names)
 
-      
 class UvData(BaseData):
     def __init__(self):
         super(UvData, self).__init__()
         self['geometry'] = str()
-        self['indices'] = list()
-        self['vertices'] = list()
+        self['current'] = str()
+        self['sets'] = dict()  # {'map1': {'u': [], 'v': [], 'counts': [uvs per face], 'ids': [face vertex uv ids]}}
@@ -0,0 +1,91 @@
+"""
+Conversions between numpy arrays (or memmap views, or the legacy nested lists) and OpenMaya arrays.
+Everything goes through numpy first so the data is flattened in C instead of python loops.
+"""
+from maya.api import OpenMaya
+
+import itertools
+import numpy as np
+
+
+def as_array(values, dtype, columns=None):
+    """
+    :param values: list, nested list, numpy array or memmap
+    :param dtype: numpy dtype of the result
+    :param int columns: reshapes the result into (-1, columns)
+    :return: numpy array, no copy when values already match
+    :rtype: numpy.ndarray
+    """
+    array = np.asarray(values, dtype=dtype)
+    if columns:
+        array = array.reshape(-1, columns)
+    return array
+
+
+def to_int_array(values):
+    # numpy integers are not python ints, MIntArray needs the conversion
+    return OpenMaya.MIntArray(as_array(values, np.int64).ravel().tolist())
+
+
+def to_double_array(values):
+    return OpenMaya.MDoubleArray(as_array(values, np.float64).ravel())
+
+
+def to_float_array(values):
+    return OpenMaya.MFloatArray(as_array(values, np.float64).ravel())
+
+
+def to_point_array(values):
+    """
+    :param values: (N, 3) or flat xyz values
+    :rtype: OpenMaya.MPointArray
+    """
+    return OpenMaya.MPointArray(as_array(values, np.float64, 3))
+
+
+def to_vector_array(values):
+    """
+    :param values: (N, 3) or flat xyz values
+    :rtype: OpenMaya.MVectorArray
+    """
+    return OpenMaya.MVectorArray(as_array(values, np.float64, 3))
+
+
+def from_int_array(values):
+    """
+    :param OpenMaya.MIntArray values:
+    :rtype: numpy.ndarray
+    """
+    return np.fromiter(values, dtype=np.int32, count=len(values))
+
+
+def from_point_array(points, homogeneous=False):
+    """
+    :param OpenMaya.MPointArray points:
+    :param bool homogeneous: keeps the w component, ie the weights of rational curve cvs
+    :return: (N, 3) array, or (N, 4) when homogeneous
+    :rtype: numpy.ndarray
+    """
+    # fromiter over the chained components is several times faster than np.array on a sequence of sequences
+    flat = np.fromiter(itertools.chain.from_iterable(points), dtype=np.float64, count=len(points) * 4)
+    if homogeneous:
+        return flat.reshape(-1, 4)
+    return flat.reshape(-1, 4)[:, :3].copy()
+
+
+def from_float_array(values):
+    """
+    :param OpenMaya.MFloatArray values:
+    :rtype: numpy.ndarray
+    """
+    return np.fromiter(values, dtype=np.float32, count=len(values))
+
+
+def from_vector_array(vectors):
+    """
+    :param vectors: OpenMaya.MVectorArray or OpenMaya.MFloatVectorArray
+    :return: (N, 3) array
+    :rtype: numpy.ndarray
+    """
+    flat = np.fromiter(itertools.chain.from_iterable(vectors), dtype=np.float64, count=len(vectors) * 3)
+    return flat.reshape(-1, 3)
@@ -1,71 +1,160 @@
+from MayaData.lib import buffer, spatial, transfer
+
 from maya.api import OpenMaya
 import numpy
 
 
+def _border_vertices(mfn_mesh):
+    """
+    :param OpenMaya.MFnMesh mfn_mesh:
+    :return: mask of the vertices on an open border, edges used by a single face
+    :rtype: numpy.ndarray
+    """
+    counts, connects = mfn_mesh.getVertices()
+    counts = buffer.from_int_array(counts)
+    connects = buffer.from_int_array(connects).astype(numpy.int64)
+
+    # Next vertex of every face vertex, wrapping around each face
+    starts = numpy.repeat(numpy.cumsum(counts) - counts, counts)
+    following = numpy.arange(len(connects)) + 1
+    following[numpy.cumsum(counts) - 1] = starts[numpy.cumsum(counts) - 1]
+    edges = numpy.sort(numpy.column_stack([connects, connects[following]]), axis=1)
+
+    edges, uses = numpy.unique(edges, axis=0, return_counts=True)
+    border = numpy.zeros(mfn_mesh.numVertices, dtype=bool)
+    border[edges[uses == 1].ravel()] = True
+    return border
+
+
+def _face_vertices(mfn_mesh):
+    """
+    :param OpenMaya.MFnMesh mfn_mesh:
+    :return: face vertices grouped by vertex, faces ascending within each vertex, with their face and world
+        space normal, and the start and count of the group of every vertex
+    :rtype: dict
+    """
+    counts, connects = mfn_mesh.getVertices()
+    counts = buffer.from_int_array(counts)
+    connects = buffer.from_int_array(connects).astype(numpy.int64)
+    faces = numpy.repeat(numpy.arange(len(counts)), counts)
+    # Per face vertex normals, so hard edges and locked normals are kept
+    normals = buffer.from_vector_array(mfn_mesh.getNormals(OpenMaya.MSpace.kWorld))
+    normals = normals[buffer.from_int_array(mfn_mesh.getNormalIds()[1])]
+
+    order = numpy.argsort(connects, kind='stable')
+    vertex_counts = numpy.bincount(connects, minlength=mfn_mesh.numVertices)
+    return {'faces': faces[order],
+            'vertices': connects[order],
+            'normals': normals[order],
+            'starts': numpy.cumsum(vertex_counts) - vertex_counts,
+            'counts': vertex_counts}
+
+
+def _get_vtx_data(mesh, vertices=None, border_only=False):
+    """
+    :param OpenMaya.MDagPath mesh:
+    :param vertices: vertex ids to keep, all of them by default
+    :param bool border_only: keeps the vertices on open borders only
+    :return: vertex ids, world positions and uvs of the kept vertices, face vertex normals of the whole mesh
+    :rtype: dict
+    """
+    mfn_mesh = OpenMaya.MFnMesh(mesh)
+    mask = numpy.zeros(mfn_mesh.numVertices, dtype=bool)
+    if vertices is None:
+        mask[:] = True
+    else:
+        mask[numpy.asarray(vertices, dtype=numpy.int64)] = True
+    if border_only:
+        mask &= _border_vertices(mfn_mesh)
+
+    ids = numpy.flatnonzero(mask)
+    return {'ids': ids,
+            'position': buffer.from_point_array(mfn_mesh.getPoints(OpenMaya.MSpace.kWorld))[ids],
+            'uv': transfer.vertex_uvs(mfn_mesh)[ids],
+            'face_vertices': _face_vertices(mfn_mesh)}
+
+
 def _get_selected_vtx_data():
     selection = OpenMaya.MGlobal.getActiveSelectionList()
-    node, component = selection.getComponent(0)
-    vertices = dict()
-
-    vertex_iter = OpenMaya.MItMeshVertex(node, component)
-    while not vertex_iter.isDone():
-        vertices[tuple(vertex_iter.position(OpenMaya.MSpace.kWorld))] = {'vertex_id': vertex_iter.index(),
-                                                                         'normals': vertex_iter.getNormals(
-                                                                             OpenMaya.MSpace.kWorld),
-                                                                         'masks': vertex_iter.getConnectedFaces()}
-        vertex_iter.next()
-    return vertices
-
-
-def _get_border_vtx_data(mesh_name):
-    mesh = OpenMaya.MSelectionList().add(mesh_name).getDagPath(0)
-    border = dict()
-
-    vertex_iter = OpenMaya.MItMeshVertex(mesh)
-    while not vertex_iter.isDone():
-        if vertex_iter.onBoundary():
-            border[tuple(vertex_iter.getUV())] = {'vertex_id': vertex_iter.index(), 'normals': vertex_iter.getNormals(),
-                                                  'masks': vertex_iter.getConnectedFaces()}
-        vertex_iter.next()
-    return border
+    mesh, component = selection.getComponent(0)
+    vertices = None
+    if not component.isNull():
+        vertices = OpenMaya.MFnSingleIndexedComponent(component).getElements()
+    return mesh, _get_vtx_data(mesh, vertices)
 
 
 class CopyNormals(object):
-    def __init__(self):
+    def __init__(self, tolerance=None):
+        """
+        :param float tolerance: target vertices farther than it from any source vertex are left untouched
+        """
+        self.tolerance = tolerance
         self._source = None
         self._target = None
+        self._grids = dict()
 
-    def from_selection(self):
-        self._source = _get_selected_vtx_data()
+    def _set_source(self, source):
+        self._source = source
+        self._grids = dict()
 
-    def to_selection(self, mesh_name):
-        source_pos = numpy.array(self._source.keys())
+    def _grid(self, space):
+        # Built once per source and space, reused by every target
+        if space not in self._grids:
+            self._grids[space] = spatial.PointGrid(self._source[space])
+        return self._grids[space]
 
-        mesh = OpenMaya.MSelectionList().add(mesh_name).getDagPath(0)
-        mesh_mfn = OpenMaya.MFnMesh(mesh)
+    def from_selection(self):
+        self._set_source(_get_selected_vtx_data()[1])
 
-        for pos, value in _get_selected_vtx_data().items():
-            np_pos = numpy.array(pos)
-            distance = numpy.linalg.norm(source_pos - np_pos, axis=1)
-            closest_pos = numpy.argmin(distance)
-            pos_key = tuple(source_pos[closest_pos])
-            for normal, face_id in zip(self._source[pos_key]['normals'], value['masks']):
-                mesh_mfn.setFaceVertexNormal(normal, face_id, value['vertex_id'], OpenMaya.MSpace.kWorld)
+    def from_mesh(self, mesh_name, border_only=False):
+        mesh = OpenMaya.MSelectionList().add(mesh_name).getDagPath(0)
+        self._set_source(_get_vtx_data(mesh, border_only=border_only))
+
+    def _apply(self, mesh, target, space):
+        """
+        Gives the face vertices of every matched target vertex the face vertex normals of the closest source
+        vertex, paired in face order like the connected faces of the vertices, in a single world space
+        setFaceVertexNormals call so the meshes don't need matching transforms.
+        """
+        closest, _ = self._grid(space).query(target[space], self.tolerance)
+        matched = closest >= 0
+        target_fv = target['face_vertices']
+        source_fv = self._source['face_vertices']
+
+        target_ids = target['ids'][matched]
+        source_ids = self._source['ids'][closest[matched]]
+        counts = numpy.minimum(target_fv['counts'][target_ids], source_fv['counts'][source_ids])
+        rank = numpy.arange(counts.sum()) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+        target_rows = numpy.repeat(target_fv['starts'][target_ids], counts) + rank
+        source_rows = numpy.repeat(source_fv['starts'][source_ids], counts) + rank
+
+        OpenMaya.MFnMesh(mesh).setFaceVertexNormals(buffer.to_vector_array(source_fv['normals'][source_rows]),
+                                                    buffer.to_int_array(target_fv['faces'][target_rows]),
+                                                    buffer.to_int_array(target_fv['vertices'][target_rows]),
+                                                    OpenMaya.MSpace.kWorld)
+
+    def to_selection(self, mesh_name=None, space='position'):
+        """
+        :param str mesh_name: target mesh, defaults to the mesh of the selected vertices
+        :param str space: 'position' or 'uv'
+        """
+        mesh, target = _get_selected_vtx_data()
+        if mesh_name:
+            mesh = OpenMaya.MSelectionList().add(mesh_name).getDagPath(0)
+            target = _get_vtx_data(mesh, target['ids'])
+        self._target = target
+        self._apply(mesh, target, space)
+
+    def to_mesh(self, mesh_name, border_only=False, space='position'):
+        """
+        :param str mesh_name: target mesh
+        :param bool border_only: only matches the vertices on open borders
+        :param str space: 'position' or 'uv'
+        """
+        mesh = OpenMaya.MSelectionList().add(mesh_name).getDagPath(0)
+        self._target = _get_vtx_data(mesh, border_only=border_only)
+        self._apply(mesh, self._target, space)
 
     def from_uv_border(self, mesh_a, mesh_b):
-        mesh_a = OpenMaya.MSelectionList().add(mesh_a).getDagPath(0)
-        self._source = _get_border_vtx_data(mesh_a)
-        mesh_a_uvs = numpy.array(self._source.keys())
-
-        mesh_b = OpenMaya.MSelectionList().add(mesh_b).getDagPath(0)
-        self._target = _get_border_vtx_data(mesh_b)
-        mesh_b_mfn = OpenMaya.MFnMesh(mesh_b)
-
-        for uv, value in self._target.items():
-            np_uv = numpy.array(uv)
-            distance = numpy.linalg.norm(mesh_a_uvs - np_uv, axis=1)
-            closest_uv = numpy.argmin(distance)
-            uv_key = tuple(mesh_a_uvs[closest_uv])
-
-            for normal, face_id in zip(self._source[uv_key]['normals'], value['masks']):
-                mesh_b_mfn.setFaceVertexNormal(normal, face_id, value['vertex_id'])
+        self.from_mesh(mesh_a, border_only=True)
+        self.to_mesh(mesh_b, border_only=True, space='uv')
@@ -0,0 +1,143 @@
+"""
+Index of the deformers driving every shape in the scene.
+
+The scene is walked once, then node added/removed and connection messages queue the deformers that
+changed so only those are indexed again on the next lookup. Finding the skin cluster or blendShape
+of a mesh becomes a dict lookup instead of a dependency graph iteration per call.
+"""
+from MayaData.lib.handle import HandleMap
+
+from maya.api import OpenMaya, OpenMayaAnim
+
+
+class DeformerIndex(object):
+    def __init__(self):
+        self._shapes = HandleMap()  # shape to the handles of its deformers
+        self._deformers = HandleMap()  # deformer to the handles of the shapes it outputs to
+        self._pending = HandleMap()  # deformers indexed again on the next lookup
+        self._built = False
+        self._callbacks = list()
+
+    @property
+    def installed(self):
+        return bool(self._callbacks)
+
+    def install(self):
+        """
+        Keeps the index up to date through scene messages.
+        """
+        if self._callbacks:
+            return
+        self._callbacks = [
+            OpenMaya.MDGMessage.addNodeAddedCallback(self._on_node_changed, 'geometryFilter'),
+            OpenMaya.MDGMessage.addNodeRemovedCallback(self._on_node_changed, 'geometryFilter'),
+            OpenMaya.MDGMessage.addConnectionCallback(self._on_connection),
+            OpenMaya.MSceneMessage.addCallback(OpenMaya.MSceneMessage.kAfterOpen, self._on_scene),
+            OpenMaya.MSceneMessage.addCallback(OpenMaya.MSceneMessage.kAfterNew, self._on_scene),
+        ]
+
+    def uninstall(self):
+        if self._callbacks:
+            OpenMaya.MMessage.removeCallbacks(self._callbacks)
+        self._callbacks = list()
+        self._built = False
+
+    def _queue(self, node):
+        handle = OpenMaya.MObjectHandle(node)
+        self._pending.setdefault(handle, handle)
+
+    def _on_node_changed(self, node, client_data):
+        self._queue(node)
+
+    def _on_connection(self, source, destination, made, client_data):
+        for plug in (source, destination):
+            node = plug.node()
+            if node.hasFn(OpenMaya.MFn.kGeometryFilt):
+                self._queue(node)
+
+    def _on_scene(self, client_data):
+        self._built = False
+
+    def _remove(self, handle):
+        for shape in self._deformers.pop(handle, ()):
+            handles = self._shapes.get(shape, list())
+            handles[:] = [each for each in handles if each != handle]
+
+    def _add(self, handle):
+        self._remove(handle)
+        if not handle.isValid():
+            return
+        shapes = OpenMayaAnim.MFnGeometryFilter(handle.object()).getOutputGeometry()
+        shapes = [OpenMaya.MObjectHandle(shape) for shape in shapes]
+        self._deformers.setdefault(handle, list()).extend(shapes)
+        for shape in shapes:
+            self._shapes.setdefault(shape, list()).append(handle)
+
+    def rebuild(self):
+        self._shapes.clear()
+        self._deformers.clear()
+        self._pending.clear()
+
+        node_iter = OpenMaya.MItDependencyNodes(OpenMaya.MFn.kGeometryFilt)
+        while not node_iter.isDone():
+            self._add(OpenMaya.MObjectHandle(node_iter.thisNode()))
+            node_iter.next()
+        self._built = True
+
+    def _refresh(self):
+        # Without callbacks nothing tells the index the scene changed, so it walks it every time
+        if not self._built or not self._callbacks:
+            self.rebuild()
+            return
+        pending, self._pending = self._pending, HandleMap()
+        for handle, _ in pending.items():
+            if handle.isValid():
+                self._add(handle)
+                continue
+            self._remove(handle)
+
+    def deformers(self, shape, fn_type=None):
+        """
+        :param OpenMaya.MObject shape: shape node
+        :param int fn_type: OpenMaya.MFn type to filter by
+        :return: deformers outputting to the shape
+        :rtype: list(OpenMaya.MObject)
+        """
+        self._refresh()
+        found = list()
+        for handle in self._shapes.get(OpenMaya.MObjectHandle(shape), ()):
+            if not handle.isValid():
+                continue
+            obj = handle.object()
+            if fn_type is None or obj.hasFn(fn_type):
+                found.append(obj)
+        return found
+
+
+_index = None
+
+
+def get_index():
+    """
+    :return: the scene index, created and hooked to the scene messages on first use
+    :rtype: DeformerIndex
+    """
+    global _index
+    if _index is None:
+        _index = DeformerIndex()
+        _index.install()
+    return _index
+
+
+def find(name, fn_type):
+    """
+    :param str name: mesh transform or shape
+    :param int fn_type: OpenMaya.MFn type, ie kSkinClusterFilter or kBlendShape
+    :return: first deformer of that type on the shape
+    :rtype: OpenMaya.MObject/None
+    """
+    dag = OpenMaya.MSelectionList().add(name).getDagPath(0)
+    dag = dag.extendToShape()
+    found = get_index().deformers(dag.node(), fn_type)
+    if found:
+        return found[0]
@@ -0,0 +1,49 @@
+"""
+Maps keyed by scene nodes. MObjects aren't hashable and MObjectHandle.hashCode() isn't unique, so the hash
+code only picks a bucket and the nodes in it are told apart by MObjectHandle equality.
+"""
+
+
+class HandleMap(object):
+    """
+    Dict like map keyed by OpenMaya.MObjectHandle.
+    """
+    def __init__(self):
+        self._buckets = dict()
+
+    def clear(self):
+        self._buckets.clear()
+
+    def _find(self, handle):
+        bucket = self._buckets.get(handle.hashCode(), ())
+        for entry in bucket:
+            if entry[0] == handle:
+                return entry
+        return None
+
+    def __contains__(self, handle):
+        return self._find(handle) is not None
+
+    def get(self, handle, default=None):
+        entry = self._find(handle)
+        return default if entry is None else entry[1]
+
+    def setdefault(self, handle, default):
+        entry = self._find(handle)
+        if entry is None:
+            entry = [handle, default]
+            self._buckets.setdefault(handle.hashCode(), list()).append(entry)
+        return entry[1]
+
+    def pop(self, handle, default=None):
+        bucket = self._buckets.get(handle.hashCode(), list())
+        for i, entry in enumerate(bucket):
+            if entry[0] == handle:
+                del bucket[i]
+                if not bucket:
+                    del self._buckets[handle.hashCode()]
+                return entry[1]
+        return default
+
+    def items(self):
+        return [tuple(entry) for bucket in self._buckets.values() for entry in bucket]
@@ -0,0 +1,134 @@
+"""
+Influence editing on sparse skin weights (see data.skin.SkinData).
+Every edit is a single column remap: each old influence points to the column it ends up in,
+removed influences point to the influence receiving their weight, and the rows are coalesced in one pass.
+"""
+from maya.api import OpenMaya
+
+import numpy as np
+
+
+def get_parents(influences):
+    """
+    :param list influences: influence names
+    :return: influence name to its parent name, None for the roots
+    :rtype: dict
+    """
+    parents = dict()
+    for name in influences:
+        mfn_dag = OpenMaya.MFnDagNode(OpenMaya.MSelectionList().add(name).getDagPath(0))
+        parent = mfn_dag.parent(0)
+        parents[name] = None if parent.hasFn(OpenMaya.MFn.kWorld) else OpenMaya.MFnDagNode(parent).partialPathName()
+    return parents
+
+
+def _receiver(name, kept, target, parents):
+    if target:
+        return target
+    if parents:
+        parent = parents.get(name)
+        while parent is not None:
+            if parent in kept:
+                return parent
+            parent = parents.get(parent)
+    raise ValueError('No influence left to receive the weights of {}'.format(name))
+
+
+def column_map(influences, removed, target=None, parents=None):
+    """
+    :param list influences: current influence names
+    :param removed: names leaving the skin
+    :param str target: receives all removed weights
+    :param dict parents: name to parent name, removed weights go to the closest kept ancestor when there's no target
+    :return: the kept influence names and, for every current influence, the index of its new column
+    :rtype: tuple(list, numpy.ndarray)
+    """
+    removed = set(removed)
+    kept = [name for name in influences if name not in removed]
+    if target and target not in kept:
+        kept.append(target)
+
+    new_index = {name: i for i, name in enumerate(kept)}
+    mapping = np.empty(len(influences), dtype=np.int32)
+    for i, name in enumerate(influences):
+        if name in new_index:
+            mapping[i] = new_index[name]
+            continue
+        mapping[i] = new_index[_receiver(name, new_index, target, parents)]
+    return kept, mapping
+
+
+def remap_dense(weights, mapping, count):
+    """
+    :param numpy.ndarray weights: (vertices, influences) matrix
+    :param numpy.ndarray mapping: new column of every influence
+    :param int count: number of new columns
+    :rtype: numpy.ndarray
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    transfer = np.zeros((len(mapping), count), dtype=np.float64)
+    transfer[np.arange(len(mapping)), mapping] = 1.0
+    return weights @ transfer
+
+
+def remap_sparse(offsets, indices, weights, mapping, count):
+    """
+    Same as remap_dense on the CSR arrays, duplicated influences of a vertex are summed.
+
+    :return: offsets, indices and weights
+    :rtype: tuple(numpy.ndarray, numpy.ndarray, numpy.ndarray)
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    rows = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    columns = np.asarray(mapping, dtype=np.int64)[np.asarray(indices, dtype=np.int64)]
+
+    keys, inverse = np.unique(rows * count + columns, return_inverse=True)
+    summed = np.bincount(inverse, weights=np.asarray(weights, dtype=np.float64), minlength=len(keys))
+
+    new_rows = keys // count
+    new_offsets = np.zeros(len(offsets), dtype=np.int32)
+    np.cumsum(np.bincount(new_rows, minlength=len(offsets) - 1), out=new_offsets[1:])
+    return new_offsets, (keys % count).astype(np.int32), summed
+
+
+def _apply(data, removed, target=None, parents=None):
+    kept, mapping = column_map(data['influences'], removed, target, parents)
+    data['offsets'], data['indices'], data['weights'] = remap_sparse(data['offsets'], data['indices'],
+                                                                     data['weights'], mapping, len(kept))
+    data['influences'] = kept
+    return data
+
+
+def keep(data, names, target=None, parents=None):
+    """
+    :param SkinData data: sparse skin weights, edited in place
+    :param list names: influences to keep, the rest is removed
+    :param str target: receives the removed weights
+    :param dict parents: name to parent name, used when there's no target
+    :rtype: SkinData
+    """
+    names = set(names)
+    if target:
+        names.add(target)
+    return _apply(data, [name for name in data['influences'] if name not in names], target, parents)
+
+
+def remove(data, names, target=None, parents=None):
+    """
+    :param SkinData data: sparse skin weights, edited in place
+    :param list names: influences to remove
+    :param str target: receives the removed weights
+    :param dict parents: name to parent name, used when there's no target
+    :rtype: SkinData
+    """
+    return _apply(data, names, target, parents)
+
+
+def merge(data, names, target):
+    """
+    :param SkinData data: sparse skin weights, edited in place
+    :param list names: influences merged into target
+    :param str target: existing or new influence
+    :rtype: SkinData
+    """
+    return _apply(data, [name for name in names if name != target], target)
@@ -0,0 +1,146 @@
+"""
+Binary container used by BaseData for the '.mdata' extension.
+
+Layout: a fixed preamble (magic, version, header size), a JSON header describing the data
+and its array blocks, then the raw little-endian array blocks, each aligned to ALIGNMENT bytes.
+Numeric lists and numpy arrays are moved out of the header into blocks, everything else
+stays in the header exactly like it would be in a json file.
+"""
+import json
+import struct
+
+import numpy as np
+
+
+EXTENSION = '.mdata'
+MAGIC = b'MDATA\x00'
+VERSION = 1
+ALIGNMENT = 64
+MIN_ARRAY_SIZE = 32
+
+_ARRAY_KEY = '__array__'
+_PREAMBLE = struct.Struct('<6sHQ')
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _as_block(value):
+    """
+    Converts a numeric list or a numpy array into a little-endian array,
+    returns None if the value has to stay in the json header.
+    """
+    if isinstance(value, np.ndarray):
+        array = value
+    else:
+        if not value or not isinstance(value[0], (int, float, list, tuple)) or isinstance(value[0], bool):
+            return
+        try:
+            array = np.asarray(value)
+        except ValueError:
+            # Ragged nested lists
+            return
+        if array.size < MIN_ARRAY_SIZE:
+            return
+
+    if array.dtype.kind not in 'biuf':
+        return
+    if array.dtype.kind in 'iu' and array.size:
+        limits = np.iinfo(np.int32)
+        if limits.min <= array.min() and array.max() <= limits.max:
+            array = array.astype(np.int32)
+    return np.ascontiguousarray(array, dtype=array.dtype.newbyteorder('<'))
+
+
+def _encode(value, blocks):
+    if isinstance(value, dict):
+        return {str(key): _encode(val, blocks) for key, val in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        array = _as_block(value)
+        if array is not None:
+            blocks.append(array)
+            return {_ARRAY_KEY: len(blocks) - 1}
+        return [_encode(val, blocks) for val in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _decode(value, arrays, as_list):
+    if isinstance(value, dict):
+        if _ARRAY_KEY in value and len(value) == 1:
+            array = arrays[value[_ARRAY_KEY]]
+            return array.tolist() if as_list else array
+        return {key: _decode(val, arrays, as_list) for key, val in value.items()}
+    if isinstance(value, list):
+        return [_decode(val, arrays, as_list) for val in value]
+    return value
+
+
+def is_mdata(file_path):
+    return str(file_path).lower().endswith(EXTENSION)
+
+
+def write(file_path, data):
+    """
+    :param str file_path: destination of the container
+    :param dict data: any json serializable dict, numpy arrays included
+    """
+    blocks = list()
+    tree = _encode(data, blocks)
+
+    table = list()
+    offset = 0
+    for array in blocks:
+        offset = _align(offset)
+        table.append({'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset})
+        offset += array.nbytes
+
+    header = json.dumps({'data': tree, 'arrays': table}, separators=(',', ':')).encode('utf-8')
+    data_start = _align(_PREAMBLE.size + len(header))
+
+    with open(file_path, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        for array, info in zip(blocks, table):
+            f.seek(data_start + info['offset'])
+            f.write(array.tobytes())
+
+
+def read(file_path, as_list=True, mmap=False):
+    """
+    :param str file_path: container to read
+    :param bool as_list: converts the array blocks back into python lists, same as a json file would give
+    :param bool mmap: returns the array blocks as read-only numpy.memmap views of the file,
+        only the pages that are touched get read. Implies as_list=False
+    :return: the stored dict
+    :rtype: dict
+    """
+    with open(file_path, 'rb') as f:
+        magic, version, header_size = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+        if magic != MAGIC:
+            raise ValueError('{} is not a MayaData container'.format(file_path))
+        if version > VERSION:
+            raise ValueError('{} was written by a newer version ({})'.format(file_path, version))
+
+        header = json.loads(f.read(header_size).decode('utf-8'))
+        data_start = _align(_PREAMBLE.size + header_size)
+
+        arrays = list()
+        for info in header['arrays']:
+            dtype = np.dtype(info['dtype'])
+            shape = tuple(info['shape'])
+            count = int(np.prod(shape))
+            if mmap:
+                if not count:
+                    # numpy can't map a zero length block
+                    arrays.append(np.empty(shape, dtype=dtype))
+                    continue
+                arrays.append(np.memmap(file_path, dtype=dtype, mode='r', offset=data_start + info['offset'],
+                                        shape=shape))
+                continue
+            f.seek(data_start + info['offset'])
+            arrays.append(np.fromfile(f, dtype=dtype, count=count).reshape(shape))
+
+    return _decode(header['data'], arrays, as_list and not mmap)
@@ -0,0 +1,142 @@
+"""
+Ordered rename rules shared by the load functions.
+
+Every rule compiles its pattern once, a Renamer runs its rules in order and remembers every name it
+has seen, so names repeated across a network or a rig are only renamed once.
+
+    renamer = rename.Renamer(rename.Namespace('char01'), rename.Mirror())
+    skeleton.load(data, rename=renamer)
+"""
+import re
+
+import numpy as np
+
+
+class Prefix(object):
+    def __init__(self, prefixes):
+        """
+        :param dict prefixes: old prefix to new prefix, only the longest matching one is replaced
+        """
+        self.prefixes = dict(prefixes)
+        keys = sorted(self.prefixes, key=len, reverse=True)
+        self._pattern = re.compile('^(?:{})'.format('|'.join(re.escape(key) for key in keys))) if keys else None
+
+    def __call__(self, name):
+        if self._pattern is None:
+            return name
+        return self._pattern.sub(lambda match: self.prefixes[match.group(0)], name, count=1)
+
+
+class Regex(object):
+    def __init__(self, pattern, replacement, count=0, flags=0):
+        """
+        :param str pattern: regular expression
+        :param replacement: string or function, as taken by re.sub
+        :param int count: replacements per name, all of them by default
+        """
+        self._pattern = re.compile(pattern, flags)
+        self.replacement = replacement
+        self.count = count
+
+    def __call__(self, name):
+        return self._pattern.sub(self.replacement, name, count=self.count)
+
+
+class Namespace(object):
+    def __init__(self, new='', old=None):
+        """
+        Applied to every level of a dag path.
+
+        :param str new: namespace given to the names, '' strips it
+        :param str old: only names in this namespace are changed, '' for the root namespace,
+            any namespace by default
+        """
+        self.new = new
+        self.old = old
+
+    def _segment(self, segment):
+        namespace, _, short_name = segment.rpartition(':')
+        if self.old is not None and namespace != self.old:
+            return segment
+        return '{}:{}'.format(self.new, short_name) if self.new else short_name
+
+    def __call__(self, name):
+        return '|'.join(self._segment(segment) for segment in name.split('|'))
+
+
+class Mirror(object):
+    def __init__(self, pairs=(('L_', 'R_'), ('_L', '_R'), ('left', 'right'), ('Left', 'Right'))):
+        """
+        Swaps side tokens. A token starting or ending with a letter or digit only matches when it
+        isn't glued to another one, so 'L_' doesn't match inside 'COL_'.
+
+        :param pairs: (left, right) tokens
+        """
+        self.swap = dict()
+        for left, right in pairs:
+            self.swap[left] = right
+            self.swap[right] = left
+
+        tokens = list()
+        for token in sorted(self.swap, key=len, reverse=True):
+            before = r'(?<![A-Za-z0-9])' if token[0].isalnum() else ''
+            after = r'(?![A-Za-z0-9])' if token[-1].isalnum() else ''
+            tokens.append('{}{}{}'.format(before, re.escape(token), after))
+        self._pattern = re.compile('|'.join(tokens))
+
+    def __call__(self, name):
+        return self._pattern.sub(lambda match: self.swap[match.group(0)], name)
+
+
+class Renamer(object):
+    def __init__(self, *rules):
+        """
+        :param rules: callables taking and returning a name, run in order
+        """
+        self.rules = list(rules)
+        self._memo = dict()
+
+    def add(self, rule):
+        self.rules.append(rule)
+        self._memo.clear()
+        return self
+
+    def __call__(self, name):
+        renamed = self._memo.get(name)
+        if renamed is None:
+            renamed = name
+            for rule in self.rules:
+                renamed = rule(renamed)
+            self._memo[name] = renamed
+        return renamed
+
+    def map(self, names):
+        """
+        :param names: list or numpy array of names
+        :return: renamed names, an object array for numpy input and a list otherwise
+        """
+        if isinstance(names, np.ndarray):
+            unique, inverse = np.unique(names, return_inverse=True)
+            return np.array([self(str(name)) for name in unique], dtype=object)[inverse.ravel()]
+        return [self(name) for name in names]
+
+    @classmethod
+    def from_prefixes(cls, prefix_list):
+        """
+        :param list prefix_list: new root, mid and end prefixes, the legacy network.load option
+        :rtype: Renamer
+        """
+        root, mid, end = prefix_list
+        return cls(Prefix({'root_': '{}_'.format(root), 'mid_': '{}_'.format(mid), 'end_': '{}_'.format(end)}))
+
+
+def as_renamer(rename):
+    """
+    :param rename: None, a Renamer, a dict of exact names or any callable rule
+    :rtype: Renamer/None
+    """
+    if rename is None or isinstance(rename, Renamer):
+        return rename
+    if isinstance(rename, dict):
+        return Renamer(lambda name: rename.get(name, name))
+    return Renamer(rename)
@@ -0,0 +1,114 @@
+"""
+Uniform grid for nearest point queries on whole arrays, in 2D (uv) or 3D (positions).
+Points are bucketed once, a query only looks at the neighbouring cells of each point.
+"""
+import itertools
+import numpy as np
+
+
+class PointGrid(object):
+    def __init__(self, points, cell_size=None):
+        """
+        :param points: (N, D) points
+        :param float cell_size: defaults to a size holding about two points per cell
+        """
+        self.points = np.asarray(points, dtype=np.float64)
+        self.dimension = self.points.shape[1]
+
+        lower = self.points.min(axis=0) if len(self.points) else np.zeros(self.dimension)
+        upper = self.points.max(axis=0) if len(self.points) else np.zeros(self.dimension)
+        if not cell_size:
+            # Flat axes, ie a planar border in 3D or a straight seam in uv, would shrink the cells to nothing,
+            # the density is taken over the axes the points actually spread along
+            extent = upper - lower
+            spread = extent > extent.max() * 1.0e-6
+            if spread.any():
+                cell_size = (np.prod(extent[spread]) * 2.0 / max(len(self.points), 1)) ** (1.0 / spread.sum())
+                cell_size = max(cell_size, extent.max() * 1.0e-6)
+            else:
+                cell_size = 1.0
+        self.cell_size = float(cell_size)
+
+        # One empty cell of margin on each side, so neighbours of border cells stay inside the grid
+        self.origin = lower - self.cell_size
+        self.shape = np.floor((upper - self.origin) / self.cell_size).astype(np.int64) + 2
+
+        keys = self._keys(self._cells(self.points))
+        self.order = np.argsort(keys, kind='stable')
+        self.keys, self.starts, self.counts = np.unique(keys[self.order], return_index=True, return_counts=True)
+        self.offsets = np.array(list(itertools.product((-1, 0, 1), repeat=self.dimension)), dtype=np.int64)
+
+        # Direct cell to bucket table when the grid is small enough, a binary search otherwise
+        self.table = None
+        size = int(np.prod(self.shape))
+        if size <= max(8 * len(self.keys), 1 << 20):
+            self.table = np.full(size, -1, dtype=np.int64)
+            self.table[self.keys] = np.arange(len(self.keys))
+
+    def _cells(self, points):
+        return np.floor((points - self.origin) / self.cell_size).astype(np.int64)
+
+    def _keys(self, cells):
+        return np.ravel_multi_index(cells.T, self.shape, mode='clip')
+
+    def _buckets(self, keys):
+        if self.table is not None:
+            return self.table[keys]
+        slot = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return np.where(self.keys[slot] == keys, slot, -1)
+
+    def _brute_force(self, points, chunk=256):
+        indices = np.empty(len(points), dtype=np.int64)
+        distances = np.empty(len(points), dtype=np.float64)
+        for i in range(0, len(points), chunk):
+            block = np.linalg.norm(points[i:i + chunk, None] - self.points[None], axis=2)
+            indices[i:i + chunk] = block.argmin(axis=1)
+            distances[i:i + chunk] = block[np.arange(len(block)), indices[i:i + chunk]]
+        return indices, distances
+
+    def query(self, points, tolerance=None):
+        """
+        :param points: (M, D) query points
+        :param float tolerance: points farther than it get -1
+        :return: index of the closest point and its distance
+        :rtype: tuple(numpy.ndarray, numpy.ndarray)
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, self.dimension)
+        best = np.full(len(points), -1, dtype=np.int64)
+        distances = np.full(len(points), np.inf)
+        if not len(self.points):
+            return best, distances
+
+        cells = self._cells(points)
+        # Queries walked in cell order keep the gathers below cache friendly
+        cells_order = np.argsort(self._keys(cells), kind='stable')
+        for offset in self.offsets:
+            neighbour = cells[cells_order] + offset
+            inside = np.all((neighbour >= 0) & (neighbour < self.shape), axis=1)
+            slot = self._buckets(self._keys(neighbour))
+            found = np.flatnonzero(inside & (slot >= 0))
+            if not len(found):
+                continue
+            rows = cells_order[found]
+            slot = slot[found]
+            counts = self.counts[slot]
+
+            for k in range(int(counts.max())):
+                valid = k < counts
+                valid_rows = rows[valid]
+                candidates = self.order[self.starts[slot[valid]] + k]
+                distance = np.linalg.norm(self.points[candidates] - points[valid_rows], axis=1)
+                closer = distance < distances[valid_rows]
+                best[valid_rows[closer]] = candidates[closer]
+                distances[valid_rows[closer]] = distance[closer]
+
+        # Anything farther than a cell may have a closer point outside the neighbourhood
+        unresolved = distances > self.cell_size
+        if tolerance is not None:
+            unresolved &= tolerance > self.cell_size
+        if unresolved.any():
+            best[unresolved], distances[unresolved] = self._brute_force(points[unresolved])
+
+        if tolerance is not None:
+            best[distances > tolerance] = -1
+        return best, distances
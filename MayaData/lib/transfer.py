@@ -0,0 +1,164 @@
+"""
+Transfer of per vertex offsets between meshes with different topologies.
+
+The correspondence is computed once: every target vertex gets the three source vertices of the
+triangle it lands on and their barycentric weights, either by closest point or in uv space.
+Applying it to any number of targets is then a gather and a weighted sum on whole arrays.
+"""
+from MayaData.lib import buffer
+
+from maya.api import OpenMaya
+from concurrent import futures
+
+import numpy as np
+
+
+def _mesh_data(points, counts, connects):
+    """
+    Builds a mesh in memory, nothing is added to the scene.
+
+    :rtype: tuple(OpenMaya.MObject, OpenMaya.MFnMesh)
+    """
+    data_obj = OpenMaya.MFnMeshData().create()
+    mfn_mesh = OpenMaya.MFnMesh()
+    mfn_mesh.create(buffer.to_point_array(points), buffer.to_int_array(counts), buffer.to_int_array(connects),
+                    parent=data_obj)
+    return data_obj, mfn_mesh
+
+
+def _barycentric(data_obj, mfn_mesh, query_points):
+    """
+    :return: (M, 3) vertex ids of the closest triangles and their (M, 3) barycentric weights
+    :rtype: tuple(numpy.ndarray, numpy.ndarray)
+    """
+    intersector = OpenMaya.MMeshIntersector()
+    intersector.create(data_obj, OpenMaya.MMatrix())
+
+    indices = np.empty((len(query_points), 3), dtype=np.int32)
+    weights = np.empty((len(query_points), 3), dtype=np.float64)
+    for i, point in enumerate(query_points):
+        hit = intersector.getClosestPoint(OpenMaya.MPoint(point))
+        u, v = hit.barycentricCoords
+        indices[i] = mfn_mesh.getPolygonTriangleVertices(hit.face, hit.triangle)
+        weights[i] = u, v, 1.0 - u - v
+    return indices, weights
+
+
+def from_closest_point(points, counts, connects, query_points):
+    """
+    :param points: (N, 3) source points
+    :param counts: source face vertex counts
+    :param connects: source face vertex ids
+    :param query_points: (M, 3) target points, in the same space as the source
+    :rtype: Correspondence
+    """
+    data_obj, mfn_mesh = _mesh_data(points, counts, connects)
+    query_points = buffer.as_array(query_points, np.float64, 3)
+    return Correspondence(len(points), *_barycentric(data_obj, mfn_mesh, query_points))
+
+
+def from_uv(source_count, uvs, uv_counts, uv_ids, counts, connects, query_uvs):
+    """
+    The source uv layout is built as a flat mesh, so the closest point query happens in uv space
+    and the uv ids found are mapped back to the source vertices.
+
+    :param int source_count: number of source vertices
+    :param uvs: (U, 2) source uvs
+    :param uv_counts: source uv count per face, 0 for faces without uvs
+    :param uv_ids: source face vertex uv ids
+    :param counts: source face vertex counts
+    :param connects: source face vertex ids
+    :param query_uvs: (M, 2) uv of every target vertex
+    :rtype: Correspondence
+    """
+    uvs = buffer.as_array(uvs, np.float64, 2)
+    uv_counts = buffer.as_array(uv_counts, np.int32)
+    uv_ids = buffer.as_array(uv_ids, np.int64)
+    connects = buffer.as_array(connects, np.int64)
+
+    has_uvs = np.repeat(uv_counts > 0, buffer.as_array(counts, np.int64))
+    uv_to_vertex = np.zeros(len(uvs), dtype=np.int32)
+    uv_to_vertex[uv_ids] = connects[has_uvs]
+
+    flat = np.column_stack([uvs, np.zeros(len(uvs))])
+    data_obj, mfn_mesh = _mesh_data(flat, uv_counts[uv_counts > 0], uv_ids)
+
+    query_uvs = buffer.as_array(query_uvs, np.float64, 2)
+    query_points = np.column_stack([query_uvs, np.zeros(len(query_uvs))])
+    indices, weights = _barycentric(data_obj, mfn_mesh, query_points)
+    return Correspondence(source_count, uv_to_vertex[indices], weights)
+
+
+def vertex_uvs(mfn_mesh, uv_set=None):
+    """
+    :param OpenMaya.MFnMesh mfn_mesh:
+    :param str uv_set: defaults to the current uv set
+    :return: (N, 2) uv of every vertex, the first one found for vertices split in uv space
+    :rtype: numpy.ndarray
+    """
+    uv_counts, uv_ids = mfn_mesh.getAssignedUVs(uv_set) if uv_set else mfn_mesh.getAssignedUVs()
+    counts, connects = mfn_mesh.getVertices()
+    u, v = mfn_mesh.getUVs(uv_set) if uv_set else mfn_mesh.getUVs()
+
+    has_uvs = np.repeat(buffer.from_int_array(uv_counts) > 0, buffer.from_int_array(counts))
+    connects = buffer.from_int_array(connects)[has_uvs]
+    uv_ids = buffer.from_int_array(uv_ids)
+
+    # Reversed so the first face vertex of each vertex is the one written last
+    vertex_uv = np.zeros(mfn_mesh.numVertices, dtype=np.int64)
+    vertex_uv[connects[::-1]] = uv_ids[::-1]
+    return np.column_stack([np.array(u, dtype=np.float64), np.array(v, dtype=np.float64)])[vertex_uv]
+
+
+def _apply_chunk(indices, weights, source_count, targets, tolerance):
+    """
+    All the targets of the chunk are stacked as columns and moved at once:
+    result = W @ D, where W holds the three barycentric weights of every target vertex.
+    """
+    stacked = np.zeros((source_count, 3 * len(targets)), dtype=np.float64)
+    for i, target in enumerate(targets):
+        stacked[buffer.as_array(target['indices'], np.int64), 3 * i:3 * i + 3] = buffer.as_array(
+            target['deltas'], np.float64, 3)
+
+    moved = np.einsum('mk,mkc->mc', weights, stacked[indices])
+
+    result = list()
+    for i, target in enumerate(targets):
+        deltas = moved[:, 3 * i:3 * i + 3]
+        keep = np.flatnonzero(np.linalg.norm(deltas, axis=1) > tolerance)
+        result.append({'name': target['name'], 'index': target['index'],
+                       'indices': keep.astype(np.int32), 'deltas': deltas[keep]})
+    return result
+
+
+class Correspondence(object):
+    def __init__(self, source_count, indices, weights):
+        """
+        :param int source_count: number of source vertices
+        :param numpy.ndarray indices: (M, 3) source vertex ids of every target vertex
+        :param numpy.ndarray weights: (M, 3) barycentric weights
+        """
+        self.source_count = source_count
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.weights = np.asarray(weights, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.indices)
+
+    def apply(self, targets, tolerance=1.0e-5, chunk=32, workers=1):
+        """
+        :param list targets: sparse targets, {'name', 'index', 'indices', 'deltas'} on the source
+        :param float tolerance: offsets shorter than it are dropped from the result
+        :param int chunk: targets moved together, bounds the memory used by the stacked offsets
+        :param int workers: threads sharing the chunks, numpy releases the GIL while it multiplies
+        :return: the same targets expressed on the target mesh
+        :rtype: list
+        """
+        chunks = [targets[i:i + chunk] for i in range(0, len(targets), chunk)]
+        args = (self.indices, self.weights, self.source_count)
+        if workers > 1 and len(chunks) > 1:
+            with futures.ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(lambda each: _apply_chunk(*args, each, tolerance), chunks))
+        else:
+            results = [_apply_chunk(*args, each, tolerance) for each in chunks]
+        return [target for result in results for target in result]
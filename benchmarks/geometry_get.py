@@ -0,0 +1,73 @@
+"""
+Compares the per face geometry.get extraction against the bulk getVertices/getPoints path
+on a generated quad grid, through the stubbed OpenMaya in stub_maya.
+
+    python benchmarks/geometry_get.py --faces 500000
+"""
+import argparse
+import time
+
+import stub_maya
+
+OpenMaya = stub_maya.install()
+
+from MayaData.data import geometry
+
+
+def legacy_get(name):
+    dag_obj = OpenMaya.MSelectionList().add(name).getDagPath(0)
+    mfn_mesh = OpenMaya.MFnMesh(dag_obj)
+    data = geometry.GeometryData()
+    data['name'] = name
+    data['matrix'] = list(dag_obj.inclusiveMatrix())
+
+    data['vertices'] = list()
+    points = mfn_mesh.getPoints()
+    for point in points:
+        data['vertices'].append([point.x, point.y, point.z])
+
+    data['indices'] = list()
+    data['faces'] = list()
+
+    for face_id in range(0, mfn_mesh.numPolygons):
+        poly_connect = mfn_mesh.getPolygonVertices(face_id)
+        data['faces'].append(len(poly_connect))
+
+        data['indices'].extend([i for i in poly_connect])
+
+    return data
+
+
+def _time(func, name, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(name)
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--faces', type=int, default=500000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    OpenMaya.MSelectionList.scene['mesh'] = stub_maya.StubMesh(args.faces)
+
+    legacy, legacy_data = _time(legacy_get, 'mesh', args.repeat)
+    bulk, bulk_data = _time(geometry.get.__wrapped__, 'mesh', args.repeat)
+
+    assert bulk_data['vertices'].tolist() == legacy_data['vertices']
+    assert bulk_data['faces'].tolist() == legacy_data['faces']
+    assert bulk_data['indices'].tolist() == legacy_data['indices']
+
+    faces = len(legacy_data['faces'])
+    print(f'faces : {faces:<10} per face loop : {legacy:.4f} sec   bulk : {bulk:.4f} sec   '
+          f'speedup : {legacy / bulk:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Compares the per joint findPlug/deepcopy skeleton.get capture against the cached attribute path,
+nested and flat, on a generated joint hierarchy through the stubbed OpenMaya in stub_maya.
+
+    python benchmarks/skeleton_get.py --depth 40 --width 50
+"""
+import argparse
+import contextlib
+import copy
+import io
+import time
+
+import stub_maya
+
+OpenMaya = stub_maya.install()
+
+from MayaData.data import skeleton
+
+
+def _legacy_attributes(joint, include_namespace):
+    mfn_node = OpenMaya.MFnTransform(joint)
+    jnt_name = mfn_node.partialPathName()
+    if not include_namespace:
+        jnt_name = jnt_name.split(':')[-1]
+    data = copy.deepcopy(skeleton.DEFAULT_DATA)
+    data['name'] = jnt_name
+    data['matrix'] = list(mfn_node.transformationMatrix())
+
+    orient_plug = mfn_node.findPlug('jointOrient', False)
+    for i in range(orient_plug.numChildren()):
+        data['orient'].append(orient_plug.child(i).asDouble())
+    for j in ['rx', 'ry', 'rz']:
+        data['rotation'].append(mfn_node.findPlug(j, False).asDouble())
+    for k in ['radius', 'rotateOrder', 'side', 'type']:
+        data[k] = mfn_node.findPlug(k, False).asDouble()
+    return data
+
+
+def legacy_get(name, include_namespace=True):
+    obj = skeleton._traverse_to_root(name)
+    dag_iter = OpenMaya.MItDag(OpenMaya.MItDag.kBreadthFirst, OpenMaya.MFn.kJoint)
+    dag_iter.reset(obj)
+    data = skeleton.SkeletonData()
+
+    while not dag_iter.isDone():
+        if not dag_iter.currentItem().hasFn(OpenMaya.MFn.kJoint):
+            dag_iter.next()
+            continue
+        full_name = dag_iter.fullPathName()
+        attrs = _legacy_attributes(dag_iter.currentItem(), include_namespace)
+        jnt_name = dag_iter.partialPathName()
+        data['joints'].append(jnt_name)
+
+        print(full_name)
+        data.get_bone(full_name, attrs)
+        dag_iter.next()
+    return data
+
+
+def _time(func, name, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        # get_bone used to print every path, it's kept in the legacy timing but out of the terminal
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = func(name)
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--depth', type=int, default=40)
+    parser.add_argument('--width', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    stub_maya.StubSkeleton(args.depth, args.width).register()
+
+    legacy, legacy_data = _time(legacy_get, 'root', args.repeat)
+    nested, nested_data = _time(skeleton.get.__wrapped__, 'root', args.repeat)
+    flat, flat_data = _time(skeleton.get_flat.__wrapped__, 'root', args.repeat)
+
+    assert nested_data == legacy_data
+    expected = skeleton.FlatSkeletonData.from_tree(legacy_data)
+    assert sorted(flat_data['names']) == sorted(expected['names'])
+    order = [flat_data.index(name) for name in expected['names']]
+    assert (flat_data['matrices'][order] == expected['matrices']).all()
+    assert (flat_data['orients'][order] == expected['orients']).all()
+
+    joints = len(legacy_data['joints'])
+    print(f'joints : {joints:<8} per joint findPlug : {legacy:.4f} sec   cached nested : {nested:.4f} sec '
+          f'({legacy / nested:.1f}x)   flat arrays : {flat:.4f} sec ({legacy / flat:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
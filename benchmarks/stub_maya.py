@@ -0,0 +1,568 @@
+"""
+Minimal stand-ins for the maya and PySide modules so the data modules can be imported and timed
+outside of Maya. Only what the benchmarks touch is implemented, import this before MayaData.
+"""
+import collections
+import os
+import sys
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Tuple backed so attribute and sequence access both run in C, like the real wrappers
+MPoint = collections.namedtuple('MPoint', ['x', 'y', 'z', 'w'], defaults=[0.0, 0.0, 0.0, 1.0])
+
+
+class MMatrix(list):
+    def __init__(self, values=None):
+        super(MMatrix, self).__init__(values or [1.0, 0.0, 0.0, 0.0,
+                                                 0.0, 1.0, 0.0, 0.0,
+                                                 0.0, 0.0, 1.0, 0.0,
+                                                 0.0, 0.0, 0.0, 1.0])
+
+
+class MDagPath(object):
+    def __init__(self, node):
+        self._node = node
+
+    def node(self):
+        return self._node
+
+    def inclusiveMatrix(self):
+        return MMatrix()
+
+    def childCount(self):
+        return len(self._node.children)
+
+    def child(self, index):
+        return self._node.children[index]
+
+    def pop(self):
+        self._node = self._node.parent
+
+
+class MSelectionList(object):
+    scene = dict()
+
+    def __init__(self):
+        self._items = list()
+
+    def add(self, name):
+        node = self.scene.get(name)
+        if node is None:
+            node = _find_dag_node(name)
+        self._items.append(node)
+        return self
+
+    def length(self):
+        return len(self._items)
+
+    def getDagPath(self, index):
+        return MDagPath(self._items[index])
+
+    def getDependNode(self, index):
+        return self._items[index]
+
+
+class StubMesh(object):
+    """
+    Grid of quads. Everything is built upfront so each API call only pays for the copy it hands
+    back, which is what the C++ side costs compared to the python call overhead.
+    """
+    def __init__(self, faces):
+        self.width = int(faces ** 0.5)
+        self.height = faces // self.width
+        self.points = [MPoint(float(x), 0.0, float(z))
+                       for z in range(self.height + 1) for x in range(self.width + 1)]
+        row = self.width + 1
+        self.polygons = [(z * row + x, z * row + x + 1, (z + 1) * row + x + 1, (z + 1) * row + x)
+                         for z in range(self.height) for x in range(self.width)]
+        self.counts = [len(face) for face in self.polygons]
+        self.connects = [index for face in self.polygons for index in face]
+
+
+class MFnMesh(object):
+    def __init__(self, dag=None):
+        self._mesh = dag.node() if dag else None
+
+    @property
+    def numPolygons(self):
+        return len(self._mesh.polygons)
+
+    def getPoints(self, space=None):
+        return list(self._mesh.points)
+
+    def getPolygonVertices(self, face_id):
+        return list(self._mesh.polygons[face_id])
+
+    def getVertices(self):
+        return list(self._mesh.counts), list(self._mesh.connects)
+
+
+MFn = types.SimpleNamespace(kWorld=0, kTransform=1, kJoint=2, kMesh=3, kMessageAttribute=4, kShape=5,
+                            kNurbsCurve=6)
+
+
+class StubNode(object):
+    fn_types = (MFn.kTransform,)
+
+    def __init__(self, name, parent=None):
+        self.name = name
+        self.parent = None
+        self.children = list()
+        self.values = dict()
+        self.sources = dict()
+        self.destinations = dict()
+        self.full_path = '|{}'.format(name)
+        if parent is not None:
+            self.set_parent(parent)
+
+    def hasFn(self, fn_type):
+        return fn_type in self.fn_types
+
+    def _update_paths(self):
+        for node in [self] + self.descendants():
+            parent_path = node.parent.full_path if node.parent is not None else ''
+            node.full_path = '{}|{}'.format(parent_path, node.name)
+
+    def set_parent(self, parent):
+        if self.parent is not None:
+            self.parent.children.remove(self)
+        self.parent = parent
+        if parent is not None:
+            parent.children.append(self)
+        self._update_paths()
+
+    def rename(self, name):
+        self.name = name
+        self._update_paths()
+
+    def descendants(self):
+        nodes = list(self.children)
+        for node in nodes:
+            nodes.extend(node.children)
+        return nodes
+
+    def connect(self, attribute, destination, destination_attribute):
+        self.destinations.setdefault(attribute, list()).append((destination, destination_attribute))
+        destination.sources[destination_attribute] = (self, attribute)
+
+
+class StubWorld(StubNode):
+    fn_types = (MFn.kWorld,)
+
+    def __init__(self):
+        super(StubWorld, self).__init__('')
+        self.full_path = ''
+
+
+class StubJoint(StubNode):
+    fn_types = (MFn.kTransform, MFn.kJoint)
+    SHORT_NAMES = {'jox': 'jointOrientX', 'joy': 'jointOrientY', 'joz': 'jointOrientZ',
+                   'rx': 'rotateX', 'ry': 'rotateY', 'rz': 'rotateZ'}
+
+    def __init__(self, name, parent, index):
+        super(StubJoint, self).__init__(name, parent)
+        self.matrix = MMatrix([1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0,
+                               float(index), 1.0, 0.0, 1.0])
+        self.values = {'jointOrientX': 0.1 * index, 'jointOrientY': 0.0, 'jointOrientZ': 0.0,
+                       'rotateX': 0.0, 'rotateY': 0.01 * index, 'rotateZ': 0.0,
+                       'radius': 1.0, 'rotateOrder': 0.0, 'side': float(index % 3), 'type': 0.0}
+
+
+class StubSkeleton(object):
+    """
+    Root joint with `width` chains of `depth` joints under it, every joint registered by name.
+    """
+    def __init__(self, depth, width):
+        self.world = StubWorld()
+        self.root = StubJoint('root', self.world, 0)
+        self.joints = [self.root]
+        for chain in range(width):
+            parent = self.root
+            for level in range(depth):
+                parent = StubJoint('chain{}_{}'.format(chain, level), parent, len(self.joints))
+                self.joints.append(parent)
+
+    def register(self):
+        for joint in self.joints:
+            MSelectionList.scene[joint.name] = joint
+
+
+class StubDGNode(StubNode):
+    """
+    Dependency node, its connections are kept as {attribute: (node, attribute)} for its inputs and
+    {attribute: [(node, attribute)]} for its outputs. hash_code stands in for MObjectHandle.hashCode().
+    """
+    fn_types = ()
+
+    def __init__(self, name, type_name='network', hash_code=None):
+        super(StubDGNode, self).__init__(name)
+        self.type_name = type_name
+        self.hash_code = id(self) if hash_code is None else hash_code
+
+
+class MObjectHandle(object):
+    def __init__(self, obj):
+        self._obj = obj
+
+    def object(self):
+        return self._obj
+
+    def isValid(self):
+        return True
+
+    def hashCode(self):
+        return getattr(self._obj, 'hash_code', id(self._obj))
+
+    def __eq__(self, other):
+        return self._obj is other._obj
+
+    def __ne__(self, other):
+        return not self == other
+
+
+StubAttribute = collections.namedtuple('StubAttribute', ['name', 'apiTypeStr'], defaults=['kNumericAttribute'])
+StubAttribute.hasFn = lambda self, fn_type: False
+
+
+class MFnAttribute(object):
+    def __init__(self, attr):
+        self.name = attr.name
+        self.dynamic = False
+
+
+class MFnDependencyNode(object):
+    def __init__(self, obj):
+        self._node = obj
+        self.typeName = obj.type_name
+        self.isDefaultNode = False
+
+    def object(self):
+        return self._node
+
+    def name(self):
+        return self._node.name
+
+    def getConnections(self):
+        attributes = sorted(set(self._node.sources) | set(self._node.destinations))
+        return [MPlug(self._node, attribute) for attribute in attributes]
+
+
+COMPOUNDS = {'jointOrient': ('jointOrientX', 'jointOrientY', 'jointOrientZ'),
+             'overrideColorRGB': ('overrideColorR', 'overrideColorG', 'overrideColorB')}
+
+
+class MPlug(object):
+    def __init__(self, node=None, attribute=None):
+        self._node = node
+        self._attribute = attribute
+
+    def asDouble(self):
+        return self._node.values[self._attribute]
+
+    def asBool(self):
+        return bool(self._node.values.get(self._attribute, False))
+
+    def node(self):
+        return self._node
+
+    def attribute(self):
+        return StubAttribute(self._attribute)
+
+    def name(self):
+        return '{}.{}'.format(self._node.name, self._attribute)
+
+    def partialName(self, useLongNames=False):
+        return self._attribute
+
+    @property
+    def isDestination(self):
+        return self._attribute in self._node.sources
+
+    def source(self):
+        return MPlug(*self._node.sources[self._attribute])
+
+    def destinations(self):
+        return [MPlug(*each) for each in self._node.destinations.get(self._attribute, ())]
+
+    def numChildren(self):
+        return len(COMPOUNDS.get(self._attribute, ()))
+
+    def child(self, index):
+        return MPlug(self._node, COMPOUNDS[self._attribute][index])
+
+
+class MNodeClass(object):
+    def __init__(self, node_type):
+        self.node_type = node_type
+
+    def attribute(self, name):
+        return name
+
+    def getAttributes(self):
+        return list()
+
+
+class MFnTransform(object):
+    def __init__(self, obj=None):
+        self._node = obj.node() if isinstance(obj, MDagPath) else obj
+
+    def setObject(self, obj):
+        self._node = obj
+
+    def object(self):
+        return self._node
+
+    def parent(self, index):
+        return self._node.parent
+
+    def partialPathName(self):
+        return _partial_path(self._node)
+
+    def transformationMatrix(self):
+        return MMatrix(self._node.matrix)
+
+    def findPlug(self, name, want_networked):
+        return MPlug(self._node, StubJoint.SHORT_NAMES.get(name, name))
+
+
+class MItDag(object):
+    kDepthFirst, kBreadthFirst = 0, 1
+
+    def __init__(self, traversal=kDepthFirst, filter_type=None):
+        self._nodes = list()
+        self._index = 0
+
+    def reset(self, root):
+        self._nodes = [root]
+        for node in self._nodes:
+            self._nodes.extend(node.children)
+        self._index = 0
+
+    def isDone(self):
+        return self._index >= len(self._nodes)
+
+    def next(self):
+        self._index += 1
+
+    def currentItem(self):
+        return self._nodes[self._index]
+
+    def fullPathName(self):
+        return self._nodes[self._index].full_path
+
+    def partialPathName(self):
+        return self._nodes[self._index].name
+
+    def getPath(self):
+        return MDagPath(self._nodes[self._index])
+
+
+# Dag scene edited by the modifiers, nodes created under kNullObj go under the world
+world = StubWorld()
+
+
+def new_scene():
+    global world
+    world = StubWorld()
+    MSelectionList.scene.clear()
+    MGlobal.active = list()
+
+
+def _find_dag_node(name):
+    """
+    Resolves a name, a partial or a full path under the world like MSelectionList.add.
+    """
+    nodes = [node for node in world.descendants()
+             if node.full_path == name or node.full_path.endswith('|{}'.format(name))]
+    if len(nodes) != 1:
+        raise RuntimeError('No unique object matches name: {}'.format(name))
+    return nodes[0]
+
+
+def _partial_path(node):
+    # The shortest path naming the node alone, like partialPathName(), registered nodes are unique
+    if MSelectionList.scene.get(node.name) is node:
+        return node.name
+    path = node.full_path.split('|')
+    for i in range(len(path) - 1, 0, -1):
+        partial = '|'.join(path[i:])
+        try:
+            if _find_dag_node(partial) is node:
+                return partial
+        except RuntimeError:
+            continue
+    return node.name
+
+
+class MObject(object):
+    kNullObj = None
+
+
+class MGlobal(object):
+    active = list()
+
+    @classmethod
+    def getActiveSelectionList(cls):
+        selection = MSelectionList()
+        selection._items = list(cls.active)
+        return selection
+
+
+class StubCurve(StubNode):
+    """
+    Curve shape, its geometry is the MFnNurbsCurveData held by the 'cached' attribute.
+    """
+    fn_types = (MFn.kShape, MFn.kNurbsCurve)
+
+    def __init__(self, name, parent=None, cvs=None, knots=None, degree=3, form=1, rational=False):
+        super(StubCurve, self).__init__(name, parent)
+        self.intermediate = False
+        if cvs is not None:
+            data = MFnNurbsCurveData().create()
+            MFnNurbsCurve().create(MPointArray(cvs), list(knots), degree, form, False, rational, data)
+            self.values['cached'] = data
+
+    @property
+    def geometry(self):
+        return self.values['cached']
+
+
+class MFnNurbsCurveData(object):
+    def create(self):
+        return types.SimpleNamespace(cvs=list(), knots=list(), degree=3, form=1, rational=False)
+
+
+class MFnDagNode(object):
+    def __init__(self, obj=None):
+        self._node = obj.node() if isinstance(obj, MDagPath) else obj
+
+    @property
+    def isIntermediateObject(self):
+        return getattr(self._node, 'intermediate', False)
+
+    def name(self):
+        return self._node.name
+
+    def object(self):
+        return self._node
+
+    def findPlug(self, name, want_networked):
+        return MPlug(self._node, name)
+
+
+class MFnNurbsCurve(MFnDagNode):
+    kOpen, kClosed, kPeriodic = 1, 2, 3
+
+    @property
+    def degree(self):
+        return self._node.geometry.degree
+
+    @property
+    def form(self):
+        return self._node.geometry.form
+
+    def cvPositions(self):
+        return list(self._node.geometry.cvs)
+
+    def knots(self):
+        return list(self._node.geometry.knots)
+
+    def create(self, cvs, knots, degree, form, is_2d, rational, parent):
+        if len(knots) != len(cvs) + degree - 1:
+            raise RuntimeError('{} knots for {} cvs of degree {}'.format(len(knots), len(cvs), degree))
+        # Without weights the cvs are kept as plain points, like Maya does
+        parent.cvs = [MPoint(*cv) if rational else MPoint(*cv[:3]) for cv in cvs]
+        parent.knots, parent.degree, parent.form, parent.rational = list(knots), degree, form, rational
+        return parent
+
+
+def MPointArray(values):
+    return [MPoint(*row) for row in values]
+
+
+def MDoubleArray(values):
+    return [float(value) for value in values]
+
+
+class MDGModifier(object):
+    """
+    Queues the edits, doIt applies them in order. A plug connected twice fails like in Maya.
+    """
+    def __init__(self):
+        self._edits = list()
+
+    def newPlugValue(self, plug, value):
+        self._edits.append(lambda: plug.node().values.__setitem__(plug.partialName(), value))
+
+    newPlugValueBool = newPlugValueInt = newPlugValueDouble = newPlugValue
+
+    def connect(self, source, destination):
+        def edit():
+            if destination.isDestination:
+                raise RuntimeError('{} is already connected'.format(destination.name()))
+            source.node().connect(source.partialName(), destination.node(), destination.partialName())
+        self._edits.append(edit)
+
+    def doIt(self):
+        edits, self._edits = self._edits, list()
+        for edit in edits:
+            edit()
+
+
+class MDagModifier(MDGModifier):
+    NODES = {'transform': StubNode, 'nurbsCurve': StubCurve}
+
+    def createNode(self, node_type, parent=None):
+        node = self.NODES[node_type]('{}1'.format(node_type))
+        self._edits.append(lambda: node.set_parent(world if parent is MObject.kNullObj else parent))
+        return node
+
+    def renameNode(self, node, name):
+        self._edits.append(lambda: node.rename(name))
+
+    def deleteNode(self, node):
+        self._edits.append(lambda: node.set_parent(None))
+
+
+def install():
+    maya = types.ModuleType('maya')
+    api = types.ModuleType('maya.api')
+    open_maya = types.ModuleType('maya.api.OpenMaya')
+    open_maya_anim = types.ModuleType('maya.api.OpenMayaAnim')
+    cmds = types.ModuleType('maya.cmds')
+    open_maya_ui = types.ModuleType('maya.OpenMayaUI')
+
+    for cls in (MPoint, MMatrix, MDagPath, MSelectionList, MFnMesh, MPlug, MNodeClass, MFnTransform, MItDag,
+                MObjectHandle, MFnAttribute, MFnDependencyNode, MObject, MGlobal, MFnDagNode, MFnNurbsCurve,
+                MFnNurbsCurveData, MPointArray, MDoubleArray, MDGModifier, MDagModifier):
+        setattr(open_maya, cls.__name__, cls)
+    open_maya.MFn = MFn
+
+    cmds.about = lambda **kwargs: '2025'
+    cmds.nodeType = lambda *args, **kwargs: ['dependNode']
+    open_maya_ui.MQtUtil = types.SimpleNamespace(mainWindow=lambda: 0)
+
+    maya.api, maya.cmds, maya.OpenMayaUI = api, cmds, open_maya_ui
+    api.OpenMaya, api.OpenMayaAnim = open_maya, open_maya_anim
+
+    qt_widgets = types.ModuleType('PySide6.QtWidgets')
+    qt_widgets.QWidget = qt_widgets.QDialog = lambda *args, **kwargs: None
+    qt_widgets.QFileDialog = None
+    pyside = types.ModuleType('PySide6')
+    pyside.QtWidgets = qt_widgets
+    shiboken = types.ModuleType('shiboken6')
+    shiboken.wrapInstance = lambda *args: None
+
+    sys.modules.update({'maya': maya, 'maya.api': api, 'maya.api.OpenMaya': open_maya,
+                        'maya.api.OpenMayaAnim': open_maya_anim, 'maya.cmds': cmds,
+                        'maya.OpenMayaUI': open_maya_ui, 'PySide6': pyside,
+                        'PySide6.QtWidgets': qt_widgets, 'shiboken6': shiboken})
+
+    # Registers the package without running MayaData/__init__.py, which imports every data module
+    package = types.ModuleType('MayaData')
+    package.__path__ = [os.path.join(ROOT, 'MayaData')]
+    sys.modules['MayaData'] = package
+    return open_maya
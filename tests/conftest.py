@@ -0,0 +1,11 @@
+"""
+The tests run outside of Maya on the stand-ins the benchmarks use.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import stub_maya
+
+stub_maya.install()
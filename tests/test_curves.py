@@ -0,0 +1,117 @@
+import json
+
+import numpy as np
+import pytest
+
+import stub_maya
+from MayaData.data import curves
+
+
+def _circle(count, radius=1.0):
+    angles = np.linspace(0.0, 2.0 * np.pi, count, endpoint=False)
+    return np.column_stack([np.cos(angles) * radius, np.zeros(count), np.sin(angles) * radius, np.ones(count)])
+
+
+@pytest.fixture
+def scene():
+    """
+    A control with an open cubic and a linear shape, a periodic circle and a rational arc under a group,
+    next to another control of the same name.
+    """
+    stub_maya.new_scene()
+    world = stub_maya.world
+
+    square = stub_maya.StubNode('square_ctrl', world)
+    stub_maya.StubCurve('square_ctrlShape', square, _circle(4), np.arange(6.0), 3, curves.OpenMaya.MFnNurbsCurve.kOpen)
+    stub_maya.StubCurve('square_ctrlShape1', square, _circle(2), [0.0, 1.0], 1, curves.OpenMaya.MFnNurbsCurve.kOpen)
+    square.children[0].values.update({'overrideEnabled': True, 'overrideColor': 17.0})
+
+    circle = stub_maya.StubNode('circle_ctrl', world)
+    stub_maya.StubCurve('circle_ctrlShape', circle, np.vstack([_circle(8), _circle(8)[:3]]), np.arange(-2.0, 11.0), 3,
+                        curves.OpenMaya.MFnNurbsCurve.kPeriodic)
+    circle.children[0].values.update({'overrideEnabled': True, 'overrideRGBColors': True, 'overrideColorR': 1.0,
+                                      'overrideColorG': 0.5, 'overrideColorB': 0.0})
+
+    for group in ('left_grp', 'right_grp'):
+        arc = stub_maya.StubNode('arc_ctrl', stub_maya.StubNode(group, world))
+        cvs = np.array([[1.0, 0.0, 0.0, 1.0], [1.0, 0.0, 1.0, 0.7071], [0.0, 0.0, 1.0, 1.0]])
+        stub_maya.StubCurve('arc_ctrlShape', arc, cvs, [0.0, 0.0, 1.0, 1.0], 2, curves.OpenMaya.MFnNurbsCurve.kOpen,
+                            rational=True)
+
+    stub_maya.MGlobal.active = [node for node in world.descendants() if node.name.endswith('_ctrl')]
+    return curves.get.__wrapped__()
+
+
+def _assert_same(data, expected):
+    for key in ('names', 'shape_names', 'degrees', 'forms', 'rational'):
+        assert list(data[key]) == list(expected[key])
+    for key in ('shape_offsets', 'cv_offsets', 'knot_offsets', 'cvs', 'knots'):
+        assert np.allclose(np.asarray(data[key]), np.asarray(expected[key]))
+    assert [np.asarray(color).tolist() for color in data['colors']] == \
+        [np.asarray(color).tolist() for color in expected['colors']]
+
+
+def test_get(scene):
+    assert scene['names'] == ['square_ctrl', 'circle_ctrl', 'left_grp|arc_ctrl', 'right_grp|arc_ctrl']
+    assert scene['shape_offsets'].tolist() == [0, 2, 3, 4, 5]
+    assert scene['forms'][2] == curves.OpenMaya.MFnNurbsCurve.kPeriodic
+    assert scene['rational'] == [False, False, False, True, True]
+    assert scene['colors'][2] == [1.0, 0.5, 0.0]
+
+
+@pytest.mark.parametrize('extension', ['.json', '.mdata'])
+def test_round_trip_new_scene(tmp_path, scene, extension):
+    file_path = str(tmp_path / 'curves{}'.format(extension))
+    scene.save(file_path)
+    data = curves.CurveData()
+    data.load(file_path)
+
+    stub_maya.new_scene()
+    shapes = curves.load.__wrapped__(data)
+    assert len(shapes) == 5
+
+    # Partial paths create their missing parents
+    assert stub_maya.MSelectionList().add('left_grp|arc_ctrl').getDagPath(0).node().parent.name == 'left_grp'
+    stub_maya.MGlobal.active = [node for node in stub_maya.world.descendants() if node.name.endswith('_ctrl')]
+    _assert_same(curves.get.__wrapped__(), scene)
+
+
+def test_round_trip_existing(tmp_path, scene):
+    file_path = str(tmp_path / 'curves.json')
+    scene.save(file_path)
+    data = curves.CurveData()
+    data.load(file_path)
+
+    square = stub_maya.MSelectionList().add('square_ctrl').getDagPath(0).node()
+    driver = stub_maya.StubDGNode('driver')
+    for shape in square.children:
+        driver.connect('output', shape, 'visibility')
+
+    curves.load.__wrapped__(data)
+    assert len(square.children) == 2
+    assert all(shape.sources['visibility'] == (driver, 'output') for shape in square.children)
+    _assert_same(curves.get.__wrapped__(), scene)
+
+
+def test_legacy_file(tmp_path, scene):
+    points = _circle(5)[:, :3].tolist()
+    file_path = str(tmp_path / 'legacy.json')
+    with open(file_path, 'w') as f:
+        json.dump({'names': ['square_ctrl', 'new_ctrl'], 'shapes': [points, points], 'colors': [6.0, 13.0],
+                   'degrees': [3, 1]}, f)
+    data = curves.CurveData()
+    data.load(file_path)
+
+    curves.load.__wrapped__(data)
+
+    # Only the first shape of an existing control is replaced, it keeps its name
+    square = stub_maya.MSelectionList().add('square_ctrl').getDagPath(0).node()
+    assert sorted(shape.name for shape in square.children) == ['square_ctrlShape', 'square_ctrlShape1']
+    replaced = [shape for shape in square.children if shape.name == 'square_ctrlShape'][0]
+    assert len(replaced.geometry.cvs) == 5
+    assert replaced.geometry.knots == curves._legacy_knots(5, 3).tolist()
+
+    new = stub_maya.MSelectionList().add('new_ctrl').getDagPath(0).node()
+    assert [shape.name for shape in new.children] == ['new_ctrlShape']
+    assert new.children[0].geometry.degree == 1
+    assert new.children[0].values['overrideColor'] == 13.0
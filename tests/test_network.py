@@ -0,0 +1,84 @@
+import pytest
+
+import stub_maya
+from MayaData.data import network
+
+
+@pytest.fixture
+def graph():
+    writer = network.GraphWriter()
+    multiply = writer.add_node({'name': 'root_multiply', 'type': 'multiplyDivide', 'DAG': False,
+                                'attributes': {'operation': 2}})
+    joint = writer.add_node({'name': 'root_joint', 'type': 'joint', 'DAG': True})
+    output = writer.add_plug({'node': multiply, 'name': 'outputX', 'custom': False})
+    for attribute in ('translateX', 'translateY'):
+        writer.connect(output, writer.add_plug({'node': joint, 'name': attribute, 'custom': False}))
+    return writer.data()
+
+
+@pytest.fixture
+def built(monkeypatch):
+    calls = list()
+    monkeypatch.setattr(network, '_build', lambda nodes, connections: calls.append((nodes, list(connections))))
+    return calls
+
+
+@pytest.mark.parametrize('extension', ['.json', '.mdata'])
+def test_graph_round_trip(tmp_path, graph, built, extension):
+    file_path = str(tmp_path / 'network{}'.format(extension))
+    graph.save(file_path)
+
+    # load() reads every file through NetworkData
+    data = network.NetworkData()
+    data.load(file_path)
+    network.load(data)
+
+    (nodes, connections), = built
+    assert nodes == {0: {'name': 'root_multiply', 'type': 'multiplyDivide', 'DAG': False,
+                         'attributes': {'operation': 2}},
+                     1: {'name': 'root_joint', 'type': 'joint', 'DAG': True}}
+    assert connections == [((0, 'outputX'), (1, 'translateX')), ((0, 'outputX'), (1, 'translateY'))]
+
+
+def test_graph_load_prefixes(tmp_path, graph, built):
+    file_path = str(tmp_path / 'network.json')
+    graph.save(file_path)
+    data = network.NetworkData()
+    data.load(file_path)
+
+    network.load(data, prefix_list=['arm', 'mid', 'end'])
+    (nodes, _), = built
+    assert [node['name'] for node in nodes.values()] == ['arm_multiply', 'arm_joint']
+
+
+def _captured_names(walker):
+    return sorted(node['name'] for node in walker.data['nodes'].values())
+
+
+def test_stop_node_sources_are_left_out():
+    source = stub_maya.StubDGNode('original', 'mesh')
+    group_parts = stub_maya.StubDGNode('groupParts1', 'groupParts')
+    skin = stub_maya.StubDGNode('skinCluster1', 'skinCluster')
+    source.connect('outMesh', group_parts, 'inputGeometry')
+    group_parts.connect('outputGeometry', skin, 'input')
+    group_parts.connect('outputGeometry', stub_maya.StubDGNode('tweak1', 'tweak'), 'input')
+
+    walker = network.Network()
+    walker.start(skin, stop_at=['groupParts'])
+    assert _captured_names(walker) == ['groupParts1', 'skinCluster1']
+    assert walker.stats['connections'] == 1
+
+
+def test_nodes_sharing_a_hash_are_told_apart():
+    first = stub_maya.StubDGNode('first', hash_code=7)
+    second = stub_maya.StubDGNode('second', hash_code=7)
+    target = stub_maya.StubDGNode('target')
+    first.connect('output', target, 'inputA')
+    second.connect('output', target, 'inputB')
+
+    walker = network.Network()
+    walker.start(target)
+    assert _captured_names(walker) == ['first', 'second', 'target']
+    nodes = walker.data['nodes']
+    sources = {nodes[plug['node']]['name'] for plug in walker.data['plugs'].values() if plug['name'] == 'output'}
+    assert sources == {'first', 'second'}
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+import stub_maya
+from MayaData.data import skeleton
+
+
+@pytest.fixture
+def flat():
+    stub_maya.StubSkeleton(3, 2).register()
+    return skeleton.get_flat.__wrapped__('root')
+
+
+@pytest.fixture
+def built(monkeypatch):
+    calls = list()
+    monkeypatch.setattr(skeleton, 'build', lambda parents, attributes: calls.append((parents, attributes)))
+    return calls
+
+
+@pytest.mark.parametrize('extension', ['.json', '.mdata'])
+def test_flat_round_trip(tmp_path, flat, built, extension):
+    file_path = str(tmp_path / 'skeleton{}'.format(extension))
+    flat.save(file_path)
+
+    # The file format isn't known before reading it, load() reads through SkeletonData
+    data = skeleton.SkeletonData()
+    data.load(file_path)
+    skeleton.load(data)
+
+    (parents, attributes), = built
+    expected_parents, expected_attributes = flat.records()
+    assert parents == expected_parents
+    assert [joint['name'] for joint in attributes] == [joint['name'] for joint in expected_attributes]
+    for joint, expected in zip(attributes, expected_attributes):
+        assert np.allclose(joint['matrix'], expected['matrix'])
+        assert np.allclose(joint['orient'], expected['orient'])
+        assert joint['side'] == expected['side']
+
+
+def test_flat_load_renames(tmp_path, flat, built):
+    file_path = str(tmp_path / 'skeleton.json')
+    flat.save(file_path)
+    data = skeleton.SkeletonData()
+    data.load(file_path)
+
+    skeleton.load(data, rename={'root': 'pelvis'})
+    (parents, attributes), = built
+    assert attributes[0]['name'] == 'pelvis'
+    assert parents[0] == -1
+
+
+def test_diff_flat_file(tmp_path, flat, monkeypatch):
+    file_path = str(tmp_path / 'skeleton.mdata')
+    flat.save(file_path)
+    data = skeleton.SkeletonData()
+    data.load(file_path)
+
+    # Nothing in the scene, every joint is created parents first
+    monkeypatch.setattr(skeleton, '_find_joint', lambda name: None)
+    changes = skeleton.diff.__wrapped__(data)
+    assert sorted(changes['create']) == list(range(flat.count))
+    created = set()
+    for row in changes['create']:
+        parent = int(flat['parents'][row])
+        assert parent < 0 or parent in created
+        created.add(row)
+
+
+def test_index_follows_names(flat):
+    assert flat.index('chain0_0') == 1
+    flat['names'][1] = 'renamed'
+    flat['names'].append('chain0_0')
+    assert flat.index('renamed') == 1
+    assert flat.index('chain0_0') == flat.count - 1
+    with pytest.raises(KeyError):
+        flat['names'].pop()
+        flat.index('chain0_0')